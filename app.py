@@ -1,8 +1,12 @@
-from flask import Flask, render_template, jsonify, request, session
+from flask import Flask, Response, render_template, jsonify, request, session, stream_with_context
 from flask_talisman import Talisman
 from dotenv import load_dotenv
 from flask_cors import CORS
+from storage import atomic_write_json
+from history import StreamHistory
 import subprocess
+import threading
+import hashlib
 import time
 import json
 import os
@@ -19,6 +23,8 @@ CORS(app, supports_credentials=True)  # Enable CORS
 DATA_FOLDER = os.path.join(os.path.dirname(__file__), 'data')  # Define the path to your Data folder
 STATS_FILE = os.path.join(DATA_FOLDER, 'stats.json')
 TARGETS_FILE = os.path.join(DATA_FOLDER, 'targets.json')
+HISTORY_FILE = os.path.join(DATA_FOLDER, 'history.db')
+HEARTBEAT_FILE = os.path.join(DATA_FOLDER, 'heartbeat.json')
 BOT_SCRIPT = os.path.join(os.path.dirname(__file__), 'bot.py')  # Path to the bot script
 
 # Default file structures
@@ -26,8 +32,7 @@ DEFAULT_STATS = {
     "streams_checked": 0,
     "active_streams": 0,
     "guilds_tracked": 0,
-    "messages_sent": 0,
-    "detailed_streams": {}
+    "messages_sent": 0
 }
 DEFAULT_TARGETS = {
     "active_targets": [],
@@ -38,6 +43,16 @@ DEFAULT_TARGETS = {
 bot_process = None
 bot_status = "offline"
 
+# The bot is considered online while its heartbeat is younger than this (seconds)
+HEARTBEAT_STALE_AFTER = float(os.getenv("HEARTBEAT_STALE_AFTER", 45))
+# How long a heartbeat read is reused before the file is checked again (seconds)
+HEARTBEAT_CACHE_TTL = float(os.getenv("HEARTBEAT_CACHE_TTL", 2))
+heartbeat_cache = {"read_at": 0.0, "data": {}}
+
+# Server-Sent Events: how often each open stream checks for new events, and how often it sends a keepalive (seconds)
+SSE_POLL_INTERVAL = float(os.getenv("SSE_POLL_INTERVAL", 1))
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", 15))
+
 # Function to ensure files exist with default content
 def ensure_file_exists(file_path, default_content):
     """Ensure a JSON file exists and is properly initialized."""
@@ -45,8 +60,7 @@ def ensure_file_exists(file_path, default_content):
         os.makedirs(DATA_FOLDER)  # Create the data folder if it doesn't exist
 
     if not os.path.exists(file_path):
-        with open(file_path, 'w') as file:
-            json.dump(default_content, file, indent=4)
+        atomic_write_json(file_path, default_content)
     else:
         try:
             # Attempt to load the JSON to ensure it's valid
@@ -54,13 +68,15 @@ def ensure_file_exists(file_path, default_content):
                 json.load(file)
         except (json.JSONDecodeError, IOError):
             # Reinitialize the file if it's corrupted
-            with open(file_path, 'w') as file:
-                json.dump(default_content, file, indent=4)
+            atomic_write_json(file_path, default_content)
 
 # Ensure critical files are initialized
 ensure_file_exists(STATS_FILE, DEFAULT_STATS)
 ensure_file_exists(TARGETS_FILE, DEFAULT_TARGETS)
 
+# Stream history written by the bot
+stream_history = StreamHistory(HISTORY_FILE)
+
 # Authentication
 @app.route('/api/auth', methods=['POST'])
 def authenticate():
@@ -70,13 +86,32 @@ def authenticate():
         return jsonify({"message": "Authentication successful"}), 200
     return jsonify({"error": "Unauthorized"}), 403
 
-# Load data from JSON files
+# Parsed JSON files keyed by path; an entry is reused while the file's (mtime, size, inode) is unchanged
+json_cache = {}
+json_cache_stats = {"hits": 0, "misses": 0}
+json_cache_lock = threading.Lock()
+
+# Load data from JSON files (the returned data is shared between requests, so treat it as read-only)
 def load_json(file_name):
     file_path = os.path.join(DATA_FOLDER, file_name)
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    return {}
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
+        return {}
+
+    signature = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+    with json_cache_lock:
+        cached = json_cache.get(file_path)
+        if cached is not None and cached[0] == signature:
+            json_cache_stats["hits"] += 1
+            return cached[1]
+        json_cache_stats["misses"] += 1
+
+    with open(file_path, 'r') as file:
+        data = json.load(file)
+    with json_cache_lock:
+        json_cache[file_path] = (signature, data)
+    return data
 
 # Home route
 @app.route('/')
@@ -107,27 +142,145 @@ def api_stats():
         "stats": load_json('stats.json'),
     })
 
-# API route to fetch detailed streams
+# Parse an optional true/false query parameter
+def parse_bool_arg(name):
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    return value.lower() in ("1", "true", "yes")
+
+# API route to fetch detailed streams, one filtered page at a time
 @app.route('/api/detailed_streams', methods=['GET'])
 def detailed_streams():
-    stats = load_json('stats.json')
-    return jsonify(stats.get("detailed_streams", {}))
+    # The ETag covers the store version and the query, so unchanged polls cost no query at all
+    version, updated_at = stream_history.get_version()
+    etag = hashlib.sha1(f"{version}:{request.query_string.decode()}".encode()).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        streams, next_cursor = stream_history.query_streams(
+            live=parse_bool_arg('live'),
+            streamer=request.args.get('streamer'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            sort=request.args.get('sort', 'start_time'),
+            descending=request.args.get('order', 'desc').lower() != 'asc',
+            limit=request.args.get('limit', 25, type=int),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = jsonify({"streams": streams, "next_cursor": next_cursor})
+    response.set_etag(etag)
+    if updated_at:
+        response.last_modified = updated_at
+    # Let browsers keep the body but always revalidate, so repeat polls come back as 304s
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# API route to check how well the JSON read cache is doing
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    with json_cache_lock:
+        return jsonify(dict(json_cache_stats, entries=len(json_cache)))
+
+# Read the bot's heartbeat, reusing the last read for HEARTBEAT_CACHE_TTL seconds
+def read_heartbeat():
+    now = time.monotonic()
+    if now - heartbeat_cache["read_at"] >= HEARTBEAT_CACHE_TTL:
+        try:
+            heartbeat_cache["data"] = load_json(os.path.basename(HEARTBEAT_FILE))
+        except (json.JSONDecodeError, IOError):
+            heartbeat_cache["data"] = {}
+        heartbeat_cache["read_at"] = now
+    return heartbeat_cache["data"]
+
+# Judge liveness on heartbeat freshness rather than on what the tmux pane is running
+def current_bot_status():
+    heartbeat = read_heartbeat()
+    age = time.time() - heartbeat["timestamp"] if "timestamp" in heartbeat else None
+    alive = age is not None and age < HEARTBEAT_STALE_AFTER and not heartbeat.get("stopped")
+    return ("online" if alive else "offline"), heartbeat, age
 
 @app.route('/api/status', methods=['GET'])
 def bot_status_endpoint():
     global bot_status
+    bot_status, heartbeat, age = current_bot_status()
+    return jsonify({
+        "status": bot_status,
+        "heartbeat_age": age,
+        "tick_count": heartbeat.get("tick_count"),
+        "last_tick_duration": heartbeat.get("last_tick_duration"),
+        "gateway_latency": heartbeat.get("gateway_latency"),
+        "outbound_queue": heartbeat.get("outbound_queue"),
+        "helix_circuit": heartbeat.get("helix_circuit"),
+        "stale_as_of": heartbeat.get("stale_as_of"),
+    })
+
+# Format one Server-Sent Events message
+def format_sse(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+# Parse the event id a client wants to resume after; new clients start from the latest event
+def resume_event_id(value):
     try:
-        # Check if the bot is running in the Sinon tmux session
-        result = subprocess.run(
-            ["tmux", "list-panes", "-t", "Sinon", "-F", "#{pane_current_command}"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        bot_status = "online" if "python3" in result.stdout else "offline"
-    except subprocess.CalledProcessError:
-        bot_status = "offline"
-    return jsonify({"status": bot_status})
+        return int(value)
+    except (TypeError, ValueError):
+        return stream_history.latest_event_id()
+
+# API route pushing stream events and bot status changes as they happen
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    last_id = resume_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def generate():
+        event_id = last_id
+        status = None
+        last_sent = time.monotonic()
+        yield "retry: 3000\n\n"
+        while True:
+            new_status = current_bot_status()[0]
+            if new_status != status:
+                status = new_status
+                yield format_sse({"status": status}, event="status")
+                last_sent = time.monotonic()
+
+            for event in stream_history.get_events(event_id):
+                event_id = event["id"]
+                yield format_sse(event["data"], event=event["type"], event_id=event_id)
+                last_sent = time.monotonic()
+
+            # Comment lines keep proxies from closing an idle stream
+            if time.monotonic() - last_sent >= SSE_KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(SSE_POLL_INTERVAL)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
+
+# Polling fallback for clients that can't keep an event stream open
+@app.route('/api/events/poll', methods=['GET'])
+def poll_events():
+    after = resume_event_id(request.args.get('after'))
+    events = stream_history.get_events(after)
+    return jsonify({
+        "events": events,
+        "last_event_id": events[-1]["id"] if events else after,
+        "status": current_bot_status()[0],
+    })
 
 # API route to control the bot
 @app.route('/api/control', methods=['POST'])
@@ -1,16 +1,28 @@
 import os
+import sys
 import discord
 import json
-import aiohttp
+import hashlib
 import asyncio
 import traceback
 import random
+import math
+import time
 from pathlib import Path
 from discord.ext import tasks
 from discord import app_commands
 from dotenv import load_dotenv
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from discord.ext.commands import has_permissions, MissingPermissions
+from twitch import TwitchClient, TwitchAPIError, CircuitBreaker, UserCache
+from streams import StreamRecord, StreamStateStore, StreamDiff, diff_streams, diff_events, embed_fingerprint
+from storage import JsonPersister, atomic_write_json, update_json_file
+from history import StreamHistory, migrate_stats_file
+from scheduler import PollScheduler, parse_hours
+from eventsub import EventSubClient, EVENTSUB_WS_URL, EVENTSUB_SUBSCRIPTIONS_URL
+from filters import FilterIndex, normalize_filters
+from outbound import DiscordActionQueue
+from ipc import SnapshotPublisher, SnapshotSubscriber
 
 # Load environment variables
 load_dotenv()
@@ -18,29 +30,196 @@ load_dotenv()
 # Get environment variables
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
+# Twitch API Configuration
+TWITCH_CLIENT_ID = os.getenv('TWITCH_CLIENT_ID')
+TWITCH_CLIENT_SECRET = os.getenv('TWITCH_CLIENT_SECRET')
+TWITCH_HTTP_TIMEOUT = float(os.getenv('TWITCH_HTTP_TIMEOUT', 10))
+TWITCH_CONNECT_TIMEOUT = float(os.getenv('TWITCH_CONNECT_TIMEOUT', 5))
+TWITCH_CONNECTIONS_PER_HOST = int(os.getenv('TWITCH_CONNECTIONS_PER_HOST', 10))
+TWITCH_MAX_STREAM_PAGES = int(os.getenv('TWITCH_MAX_STREAM_PAGES', 10))  # 100 streams per page
+
+# Twitch user metadata cache (profile images, logins); entries are refreshed after USER_CACHE_TTL seconds
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 5000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 3600))
+
+# Helix circuit breaker: open after this many consecutive failures, backing off exponentially (seconds);
+# while it is open the last good snapshot is shown, marked stale, for up to HELIX_STALE_MAX_AGE seconds
+HELIX_FAILURE_THRESHOLD = int(os.getenv('HELIX_FAILURE_THRESHOLD', 3))
+HELIX_BACKOFF_BASE = float(os.getenv('HELIX_BACKOFF_BASE', 5))
+HELIX_BACKOFF_MAX = float(os.getenv('HELIX_BACKOFF_MAX', 300))
+HELIX_STALE_MAX_AGE = float(os.getenv('HELIX_STALE_MAX_AGE', 1800))
+# Twitch categories this deployment tracks (comma-separated); each guild can follow a subset
+CATEGORY_NAMES = [name.strip() for name in os.getenv('CATEGORY_NAMES', 'BattleCore Arena').split(',') if name.strip()]
+
+# Guild fan-out configuration
+GUILD_UPDATE_CONCURRENCY = int(os.getenv('GUILD_UPDATE_CONCURRENCY', 10))
+GUILD_UPDATE_TIMEOUT = float(os.getenv('GUILD_UPDATE_TIMEOUT', 30))
+
+# How often pending stats changes are written to disk (seconds)
+STATS_FLUSH_INTERVAL = float(os.getenv('STATS_FLUSH_INTERVAL', 10))
+
+# Adaptive stream polling (seconds); POLL_HOT_HOURS is a UTC list like "18-23"
+POLL_BASE_INTERVAL = float(os.getenv('POLL_BASE_INTERVAL', 60))
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 20))
+POLL_HOT_INTERVAL = float(os.getenv('POLL_HOT_INTERVAL', 30))
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 300))
+POLL_IDLE_AFTER = float(os.getenv('POLL_IDLE_AFTER', 1800))
+POLL_HOT_HOURS = parse_hours(os.getenv('POLL_HOT_HOURS', ''))
+HELIX_BUDGET_PER_MINUTE = int(os.getenv('HELIX_BUDGET_PER_MINUTE', 60))
+
+# Optional EventSub mode: stream.online/offline for known broadcasters trigger an immediate check,
+# while the regular poll becomes a reconciliation pass. WebSocket subscriptions need a user access token.
+EVENTSUB_ENABLED = os.getenv('EVENTSUB_ENABLED', '').lower() in ('1', 'true', 'yes')
+TWITCH_USER_ACCESS_TOKEN = os.getenv('TWITCH_USER_ACCESS_TOKEN')
+EVENTSUB_WS = os.getenv('EVENTSUB_WS_URL', EVENTSUB_WS_URL)
+EVENTSUB_SUBSCRIPTIONS = os.getenv('EVENTSUB_SUBSCRIPTIONS_URL', EVENTSUB_SUBSCRIPTIONS_URL)
+
+# Safety-net limits for per-stream state (ended streams are evicted right away)
+STREAM_STATE_MAX_SIZE = int(os.getenv('STREAM_STATE_MAX_SIZE', 5000))
+STREAM_STATE_TTL = float(os.getenv('STREAM_STATE_TTL', 6 * 3600))
+
+# Startup pipeline deadlines (seconds)
+STARTUP_STEP_DEADLINE = float(os.getenv('STARTUP_STEP_DEADLINE', 30))
+STARTUP_CLEANUP_DEADLINE = float(os.getenv('STARTUP_CLEANUP_DEADLINE', 900))
+
+# How often to retry looking up developer accounts that could not be resolved yet (seconds)
+DEVELOPER_RESOLVE_RETRY = float(os.getenv('DEVELOPER_RESOLVE_RETRY', 600))
+
+# Sync slash commands even if their definitions haven't changed (or pass --force-sync)
+FORCE_TREE_SYNC = os.getenv('FORCE_TREE_SYNC', '').lower() in ('1', 'true', 'yes') or "--force-sync" in sys.argv
+
+# How often the bot publishes its liveness heartbeat for the dashboard (seconds)
+HEARTBEAT_INTERVAL = float(os.getenv('HEARTBEAT_INTERVAL', 15))
+
+# Digest mode layout: characters per embed and per message (Discord allows 4096 and 6000), and title length per stream
+DIGEST_EMBED_CHARS = int(os.getenv('DIGEST_EMBED_CHARS', 4000))
+DIGEST_MESSAGE_CHARS = int(os.getenv('DIGEST_MESSAGE_CHARS', 5800))
+DIGEST_TITLE_LENGTH = int(os.getenv('DIGEST_TITLE_LENGTH', 100))
+
+# Sharding: DISCORD_SHARDED uses AutoShardedClient; DISCORD_SHARD_COUNT/DISCORD_SHARD_IDS pin this process to some shards
+DISCORD_SHARDED = os.getenv('DISCORD_SHARDED', '').lower() in ('1', 'true', 'yes')
+DISCORD_SHARD_COUNT = int(os.getenv('DISCORD_SHARD_COUNT', 0)) or None
+DISCORD_SHARD_IDS = [int(shard_id) for shard_id in os.getenv('DISCORD_SHARD_IDS', '').split(',') if shard_id.strip()] or None
+
+# Multi-process mode: "standalone" does everything; a "leader" polls Helix and publishes each tick's snapshot
+# on IPC_ADDRESS ("host:port" or "unix:/path"); "worker" processes only update the guilds on their own shards
+PROCESS_ROLE = os.getenv('PROCESS_ROLE', 'standalone').lower()
+WORKER_NAME = os.getenv('WORKER_NAME', f"worker{os.getpid()}")
+IPC_ADDRESS = os.getenv('IPC_ADDRESS', '127.0.0.1:8765')
+
+# How many queued Discord writes may be in flight at once
+OUTBOUND_CONCURRENCY = int(os.getenv('OUTBOUND_CONCURRENCY', 10))
+
+# Shared Twitch client, one connection pool for the lifetime of the bot
+twitch = TwitchClient(
+    TWITCH_CLIENT_ID,
+    TWITCH_CLIENT_SECRET,
+    timeout=TWITCH_HTTP_TIMEOUT,
+    connect_timeout=TWITCH_CONNECT_TIMEOUT,
+    limit_per_host=TWITCH_CONNECTIONS_PER_HOST,
+    breaker=CircuitBreaker(HELIX_FAILURE_THRESHOLD, HELIX_BACKOFF_BASE, HELIX_BACKOFF_MAX),
+)
+user_cache = UserCache(twitch, max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Fire-and-forget tasks (like deleting an orphaned message), kept referenced until they finish
+background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.get_running_loop().create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# Every channel send, message edit and delete goes through this queue, paced per route and channel.
+# A send that lands after its guild update timed out is deleted unless the send asked to adopt it.
+outbound = DiscordActionQueue(
+    concurrency=OUTBOUND_CONCURRENCY,
+    on_unclaimed=lambda message: run_in_background(delete_message(message)),
+)
+
+# Leader publishes tick snapshots to the workers; workers receive them instead of polling Helix
+snapshot_publisher = SnapshotPublisher(IPC_ADDRESS) if PROCESS_ROLE == "leader" else None
+snapshot_subscriber = None
+
+# Discord client that flushes stats, closes the history store and releases the Twitch connection pool on shutdown
+class SinonClient(discord.AutoShardedClient if DISCORD_SHARDED or DISCORD_SHARD_IDS else discord.Client):
+    async def close(self):
+        # Stop the poll loop first so no tick is left using the Twitch session or the history store once they close
+        poll_task = check_twitch_streams.get_task()
+        check_twitch_streams.cancel()
+        if poll_task is not None:
+            await asyncio.gather(poll_task, return_exceptions=True)
+        if heartbeat_loop.is_running():
+            heartbeat_loop.cancel()
+        await write_heartbeat(stopped=True)
+        if eventsub_client is not None:
+            await eventsub_client.stop()
+        if snapshot_publisher is not None:
+            await snapshot_publisher.stop()
+        if snapshot_subscriber is not None:
+            await snapshot_subscriber.stop()
+        await stats_persister.stop()
+        await message_persister.stop()
+        await outbound.stop()
+        for task in list(background_tasks):
+            task.cancel()
+        if background_tasks:
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+        stream_history.close()
+        await twitch.close()
+        await super().close()
+
 # Bot Setup
 intents = discord.Intents.default()
 intents.message_content = True
-bot = discord.Client(intents=intents)
+shard_options = {}
+if DISCORD_SHARD_COUNT:
+    shard_options["shard_count"] = DISCORD_SHARD_COUNT
+if DISCORD_SHARD_IDS:
+    shard_options["shard_ids"] = DISCORD_SHARD_IDS
+bot = SinonClient(intents=intents, **shard_options)
 tree = app_commands.CommandTree(bot)
 
-# Twitch API Configuration
-TWITCH_CLIENT_ID = os.getenv('TWITCH_CLIENT_ID')
-TWITCH_CLIENT_SECRET = os.getenv('TWITCH_CLIENT_SECRET')
-CATEGORY_NAME = "BattleCore Arena"
-
 # Bools / Ints & Floats / Lists / Strings
-twitch_access_token = None
-game_id = None
+game_ids = {}  # lower-cased category name -> Helix game id
+game_names = {}  # Helix game id -> category name as Twitch spells it
+unknown_categories = set()  # lower-cased names Helix didn't recognise
 is_disconnected = False
 disconnection_time = None
 
-stream_messages_per_guild = {}
-stream_quotes = {}
 no_stream_message = {}
 stream_messages = {}
-max_viewers = {}
-detailed_streams = {}
+digest_messages = {}  # guild id -> the messages holding its digest, in page order
+stream_state = StreamStateStore(max_size=STREAM_STATE_MAX_SIZE, ttl=STREAM_STATE_TTL)  # max viewers and dev quotes per stream
+previous_streams = {}
+last_good_streams = None  # raw Helix streams from the last successful fetch
+last_good_fetch = None  # when that fetch happened
+stale_as_of = None  # set while the tick is serving last_good_streams because Helix is failing
+history_reconciled = False  # whether open history rows left over from the last run have been closed
+bot_presence = None
+last_tick_result = {}
+tick_count = 0
+last_tick_duration = None
+next_poll_interval = None
+tick_running = False
+last_tick_started = None
+early_tick_requested = False
+eventsub_client = None
+startup_started = False
+startup_timings = {}  # step name -> seconds taken, or "timeout"/"error"
+startup_cleanup_task = None
+
+# Decides how long to wait between stream checks
+poll_scheduler = PollScheduler(
+    base_interval=POLL_BASE_INTERVAL,
+    min_interval=POLL_MIN_INTERVAL,
+    hot_interval=POLL_HOT_INTERVAL,
+    max_interval=POLL_MAX_INTERVAL,
+    idle_after=POLL_IDLE_AFTER,
+    helix_budget_per_minute=HELIX_BUDGET_PER_MINUTE,
+    hot_hours=POLL_HOT_HOURS,
+)
+message_fingerprints = {}  # message id -> fingerprint of the embed it currently shows
 
 # Owner ID and authorized user ID's
 OWNER_ID = 487588371443613698
@@ -49,9 +228,19 @@ authorized_users = [OWNER_ID]
 # Data paths for JSON files
 DATE_DIR = Path("data")
 channel_settings_file = DATE_DIR / "channel_settings.json"
+guild_categories_file = DATE_DIR / "guild_categories.json"
+guild_filters_file = DATE_DIR / "guild_filters.json"
+guild_digest_file = DATE_DIR / "guild_digest.json"
 role_permissions_file = DATE_DIR / "role_permissions.json"
+developer_ids_file = DATE_DIR / "developer_ids.json"
 targets = DATE_DIR / "targets.json"
-stats_file = DATE_DIR / "stats.json"
+history_file = DATE_DIR / "history.db"
+# Workers keep their own counters, heartbeat and message ids, since each owns a different set of guilds
+process_suffix = f"-{WORKER_NAME}" if PROCESS_ROLE == "worker" else ""
+stats_file = DATE_DIR / f"stats{process_suffix}.json"
+heartbeat_file = DATE_DIR / f"heartbeat{process_suffix}.json"
+message_ids_file = DATE_DIR / f"messages{process_suffix}.json"
+command_tree_file = DATE_DIR / "command_tree.json"
 
 # Initialize stats dictionary
 stats = {
@@ -61,6 +250,31 @@ stats = {
     "guilds_tracked": 0,
 }
 
+# Every stream the bot has seen lives in SQLite; stats.json only keeps the current counters
+stream_history = StreamHistory(history_file)
+
+# Stats are written behind: changes mark them dirty and a background task flushes them
+stats_persister = JsonPersister(stats_file, lambda: stats, interval=STATS_FLUSH_INTERVAL)
+
+# Snapshot of which Discord messages show which stream, so a restart can edit them in place
+def snapshot_message_ids():
+    return {
+        "guilds": {
+            guild_id: {
+                "streams": {stream_id: [message.channel.id, message.id] for stream_id, message in streams.items()},
+                "no_stream": (
+                    [no_stream_message[guild_id].channel.id, no_stream_message[guild_id].id]
+                    if guild_id in no_stream_message else None
+                ),
+                "digest": [[message.channel.id, message.id] for message in digest_messages.get(guild_id, [])],
+            }
+            for guild_id, streams in stream_messages.items()
+        },
+        "fingerprints": {str(message_id): fingerprint for message_id, fingerprint in message_fingerprints.items()},
+    }
+
+message_persister = JsonPersister(message_ids_file, snapshot_message_ids, interval=STATS_FLUSH_INTERVAL, indent=None)
+
 # List of developers
 developers = {
     "syalen": {"url": "https://www.twitch.tv/syalen", "display_name": "Syalen"},                                # Syalen
@@ -77,6 +291,11 @@ developers = {
     "Ubisoft": {"url": "https://www.twitch.tv/ubisoft", "display_name": "Ubisoft"}                              # Ubisoft
 }
 
+# Developers are matched on their stable Twitch user id; logins are only used to look the ids up
+developer_logins = {login.lower(): login for login in developers}  # lower-cased login -> developers key
+developer_ids = {}  # Twitch user id -> developers key, filled by resolve_developer_ids() and kept in developer_ids.json
+developer_resolve_attempted = None  # time.monotonic() of the last lookup
+
 # List of quotes for the dev reports
 dev_quotes = [
     "Give them hell!", 
@@ -100,12 +319,16 @@ dev_quotes = [
 def load_stats():
     global stats
     if stats_file.exists():
+        # Move any legacy detailed_streams into the history store first
+        migrated = migrate_stats_file(stats_file, stream_history)
+        if migrated:
+            print(f"Migrated {migrated} streams from {stats_file} to {history_file}")
         with open(stats_file, "r") as file:
             stats = json.load(file)
     else:
         save_stats()
 
-# Function to save stats to stats.json
+# Function to queue stats for saving to stats.json
 def save_stats():
     global stats
     if not stats:
@@ -115,13 +338,12 @@ def save_stats():
             "active_streams": 0,
             "guilds_tracked": 0,
         }
-    with open(stats_file, "w") as file:
-        json.dump(stats, file, indent=4)
+    stats_persister.mark_dirty()
 
 # Function to update a stat
 def update_stat(key, value):
     stats[key] = value
-    save_stats()
+    stats_persister.mark_dirty()
 
 # Load channel settings from a file
 try:
@@ -135,6 +357,35 @@ try:
         role_permissions = json.load(file)
 except FileNotFoundError:
     role_permissions = {}
+
+# Load the categories each guild follows (guilds without an entry follow every tracked category)
+try:
+    with open(guild_categories_file, "r") as file:
+        guild_categories = json.load(file)
+except FileNotFoundError:
+    guild_categories = {}
+
+# Load per-guild stream filters and compile them once; they are recompiled whenever a command changes them
+try:
+    with open(guild_filters_file, "r") as file:
+        guild_filters = {guild_id: normalize_filters(filters) for guild_id, filters in json.load(file).items()}
+except FileNotFoundError:
+    guild_filters = {}
+filter_index = FilterIndex(guild_filters)
+
+# Load the guilds that get one digest message instead of a message per stream
+try:
+    with open(guild_digest_file, "r") as file:
+        digest_guilds = set(json.load(file))
+except FileNotFoundError:
+    digest_guilds = set()
+
+# Load the developer ids resolved on earlier runs, so a developer who renames after being resolved is still recognised
+try:
+    with open(developer_ids_file, "r") as file:
+        developer_ids.update({user_id: key for user_id, key in json.load(file).items() if key in developers})
+except FileNotFoundError:
+    pass
     
 # Load targets from a JSON file
 def load_targets():
@@ -147,21 +398,54 @@ def load_targets():
 
 # Save targets to a JSON file
 def save_targets():
-    with open(targets, "w") as file:
-        json.dump({"active_targets": active_targets, "past_targets": past_targets}, file, indent=4)
+    atomic_write_json(targets, {"active_targets": active_targets, "past_targets": past_targets})
         
 # Load the initial target lists
 active_targets, past_targets = load_targets()
     
-# Function to save role permissions to a file
-def save_role_permissions():
-    with open(role_permissions_file, "w") as file:
-        json.dump(role_permissions, file)
-
-# Function to save channel settings to a file
-def save_channel_settings():
-    with open(channel_settings_file, "w") as file:
-        json.dump(channel_settings, file)
+# Save one guild's entry of a {guild_id: value} settings file, merged under a lock with what other
+# processes saved, then refresh the in-memory copy from the merged result
+def save_guild_entry(path, settings, guild_id):
+    def merge(data):
+        if guild_id in settings:
+            data[guild_id] = settings[guild_id]
+        else:
+            data.pop(guild_id, None)
+        return data
+    merged = update_json_file(path, merge, indent=None)
+    settings.clear()
+    settings.update(merged)
+
+# Function to save a guild's role permissions to a file
+def save_role_permissions(guild_id):
+    save_guild_entry(role_permissions_file, role_permissions, guild_id)
+
+# Function to save a guild's channel setting to a file
+def save_channel_settings(guild_id):
+    save_guild_entry(channel_settings_file, channel_settings, guild_id)
+
+# Function to save a guild's category choices to a file
+def save_guild_categories(guild_id):
+    save_guild_entry(guild_categories_file, guild_categories, guild_id)
+
+# Function to save a guild's filters to a file and recompile the filter index
+def save_guild_filters(guild_id):
+    global filter_index
+    save_guild_entry(guild_filters_file, guild_filters, guild_id)
+    filter_index = FilterIndex(guild_filters)
+
+# Function to save whether a guild uses digest mode to a file
+def save_digest_guilds(guild_id):
+    def merge(data):
+        guilds = set(data)
+        if guild_id in digest_guilds:
+            guilds.add(guild_id)
+        else:
+            guilds.discard(guild_id)
+        return sorted(guilds)
+    merged = update_json_file(guild_digest_file, merge, default_factory=list, indent=None)
+    digest_guilds.clear()
+    digest_guilds.update(merged)
         
 # Helper function to check if a user is authorized to modify the list
 def is_authorized(interaction: discord.Interaction) -> bool:
@@ -185,119 +469,216 @@ def has_permission(interaction: discord.Interaction) -> bool:
 
 # Function to get Twitch Access Token
 async def get_twitch_access_token():
-    async with aiohttp.ClientSession() as session:
-        url = "https://id.twitch.tv/oauth2/token"
-        data = {
-            "client_id": TWITCH_CLIENT_ID,
-            "client_secret": TWITCH_CLIENT_SECRET,
-            "grant_type": "client_credentials"
-        }
-        async with session.post(url, data=data) as response:
-            response_json = await response.json()
-            return response_json.get("access_token")
-
-# Function to get the Game ID for the Category Name
-async def get_game_id():
-    global twitch_access_token, game_id
-    if twitch_access_token is None:
-        twitch_access_token = await get_twitch_access_token()
-
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.twitch.tv/helix/games?name={CATEGORY_NAME}"
-        headers = {
-            "Client-ID": TWITCH_CLIENT_ID,
-            "Authorization": f"Bearer {twitch_access_token}"
-        }
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                games = data.get("data", [])
-                if games:
-                    game_id = games[0]["id"]  # Get the ID of the first matching game
-                    print(f"Game ID for '{CATEGORY_NAME}': {game_id}")
-                else:
-                    print(f"No game found for category name '{CATEGORY_NAME}'")
-            else:
-                print(f"Error fetching game ID: {response.status}")
-
-# Function to get live streams from Twitch
+    return await twitch.get_access_token()
+
+# Function to resolve the Game IDs of the tracked categories, 100 names per request; results are cached.
+# Raises TwitchAPIError if a lookup failed, so a Helix outage is never mistaken for "no categories".
+async def get_game_ids():
+    missing = [name for name in CATEGORY_NAMES if name.lower() not in game_ids and name.lower() not in unknown_categories]
+    failed_status = None
+    for i in range(0, len(missing), 100):
+        chunk = missing[i:i + 100]
+        status, data = await twitch.helix_get("games", params=[("name", name) for name in chunk])
+        if status != 200:
+            print(f"Error fetching game IDs: {status}")
+            failed_status = status
+            continue
+        for game in data.get("data", []):
+            game_ids[game["name"].lower()] = game["id"]
+            game_names[game["id"]] = game["name"]
+            print(f"Game ID for '{game['name']}': {game['id']}")
+        for name in chunk:
+            if name.lower() not in game_ids:
+                unknown_categories.add(name.lower())
+                print(f"No game found for category name '{name}'")
+    if failed_status is not None:
+        raise TwitchAPIError("games", failed_status)
+    return game_ids
+
+# Function to get live streams from Twitch for every tracked category, 100 categories per request.
+# Returns None when Helix failed, which is not the same as no streams being live.
 async def get_twitch_streams():
-    global twitch_access_token
-    if twitch_access_token is None:
-        twitch_access_token = await get_twitch_access_token()
-    
-    if game_id is None:
-        await get_game_id()
-        if game_id is None:
-            return []  # Return an empty list if the game ID couldn't be fetched
-
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.twitch.tv/helix/streams?game_id={game_id}"
-        headers = {
-            "Client-ID": TWITCH_CLIENT_ID,
-            "Authorization": f"Bearer {twitch_access_token}"
-        }
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("data", [])  # Ensure you capture all stream data
-            else:
-                print(f"Error: {response.status}")
-                return []
-
-# Function to fetch user info from the Twitch API          
+    streams = []
+    try:
+        if len(game_ids) + len(unknown_categories) < len(CATEGORY_NAMES):
+            await get_game_ids()
+        ids = list(dict.fromkeys(game_ids.values()))
+        if not ids:
+            return []  # Every tracked category is unknown to Twitch, so nothing can be live
+
+        for i in range(0, len(ids), 100):
+            params = [("game_id", game_id) for game_id in ids[i:i + 100]]
+            async for page in twitch.helix_pages("streams", params=params, max_pages=TWITCH_MAX_STREAM_PAGES):
+                streams.extend(page)
+    except TwitchAPIError as e:
+        print(f"Error fetching streams: {e}")
+        return None
+    return streams
+
+# Categories a guild follows, as category names
+def guild_category_names(guild_id):
+    names = guild_categories.get(guild_id)
+    return CATEGORY_NAMES if names is None else names
+
+# Game ids a guild follows
+def guild_game_ids(guild_id):
+    return frozenset(game_ids[name.lower()] for name in guild_category_names(guild_id) if name.lower() in game_ids)
+
+# "the X category" / "the X and Y categories"
+def describe_categories(names):
+    if not names:
+        return "any followed category"
+    if len(names) == 1:
+        return f"the {names[0]} category"
+    return f"the {', '.join(names[:-1])} and {names[-1]} categories"
+
+# Function to fetch user info from the Twitch API (served from the user cache when possible)
 async def get_user_info(streamer_username: str):
-    url = f"https://api.twitch.tv/helix/users?login={streamer_username.lower()}"
-    headers = {
-        "Client-ID": TWITCH_CLIENT_ID,
-        "Authorization": f"Bearer {twitch_access_token}",
-    }
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    users = data.get("data", [])
-                    if users:
-                        return users[0]  # Return first user object
-                else:
-                    print(f"Failed to fetch user info for {streamer_username}: {response.status}")
-        except Exception as e:
-            print(f"Error fetching user info for {streamer_username}: {e}")
+    try:
+        users = await user_cache.get_users_by_login([streamer_username])
+        return users.get(streamer_username.lower())
+    except Exception as e:
+        print(f"Error fetching user info for {streamer_username}: {e}")
     return None
 
-# Function to delete old messages on bot startup
-async def delete_old_messages():
-    for guild_id, channel_id in channel_settings.items():
-        channel = bot.get_channel(channel_id)
+# Lower-cased logins of the developers whose user id is not known yet
+def unresolved_developer_logins():
+    resolved = set(developer_ids.values())
+    return {login for login, key in developer_logins.items() if key not in resolved}
+
+# Resolve the developers' logins to user ids and save them, so detection survives renames and display-name differences.
+# Only developers without a saved id are looked up; run_tick retries the rest every DEVELOPER_RESOLVE_RETRY seconds.
+async def resolve_developer_ids():
+    global developer_resolve_attempted
+    developer_resolve_attempted = time.monotonic()
+    logins = unresolved_developer_logins()
+    if not logins:
+        return developer_ids
+    try:
+        users = await user_cache.get_users_by_login(logins)
+    except TwitchAPIError as e:
+        print(f"Error resolving developer accounts: {e}")
+        return developer_ids
+    resolved = {user["id"]: developer_logins[login] for login, user in users.items()}
+    if resolved:
+        developer_ids.update(update_json_file(developer_ids_file, lambda data: {**data, **resolved}, indent=None))
+        if eventsub_client is not None:
+            await eventsub_client.add_broadcasters(resolved)
+    missing = logins - set(users)
+    if missing:
+        print(f"Could not resolve developer accounts: {', '.join(sorted(missing))}")
+    return developer_ids
+
+# Look up the still unresolved developers again in the background once the retry interval has passed
+def retry_developer_ids():
+    global developer_resolve_attempted
+    if developer_resolve_attempted is None or time.monotonic() - developer_resolve_attempted < DEVELOPER_RESOLVE_RETRY:
+        return
+    if unresolved_developer_logins():
+        developer_resolve_attempted = time.monotonic()
+        run_in_background(resolve_developer_ids())
+
+# The developers entry for a stream, or None; matched on user id, or on login for developers whose id is not known yet
+def developer_info(stream):
+    key = developer_ids.get(stream.user_id)
+    if key is None:
+        key = developer_logins.get(stream.user_login)
+        if key is not None and key in developer_ids.values():
+            # That developer is known under another id, so this is someone else who took the login
+            key = None
+    return developers[key] if key is not None else None
+
+# Rehydrate tracked messages from the last run as partial messages that can be edited in place
+def restore_message_ids():
+    try:
+        with open(message_ids_file, "r") as file:
+            data = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+    fingerprints = data.get("fingerprints", {})
+    restored = 0
+    for guild_id, entry in data.get("guilds", {}).items():
+        channel_id = channel_settings.get(guild_id)
+        channel = bot.get_channel(channel_id) if channel_id else None
         if channel is None:
             continue
 
-        try:
-            # Fetch the last 100 messages from the channel
-            messages = [message async for message in channel.history(limit=100)]
-            
-            # Use timezone-aware datetime for comparison
-            current_time = datetime.now(timezone.utc)
-            
-            # Separate messages into those that can be bulk deleted and those that cannot
-            messages_to_bulk_delete = [msg for msg in messages if (current_time - msg.created_at).days < 14]
-            messages_to_delete_one_by_one = [msg for msg in messages if (current_time - msg.created_at).days >= 14]
-
-            # Bulk delete messages that are less than 14 days old
-            if messages_to_bulk_delete:
-                await channel.delete_messages(messages_to_bulk_delete)
-                print(f"Bulk deleted {len(messages_to_bulk_delete)} messages in channel {channel.id}")
-
-            # Delete older messages one by one
-            for message in messages_to_delete_one_by_one:
-                await message.delete()
-                await asyncio.sleep(1)  # Sleep to avoid hitting rate limits for individual deletions
-
-        except discord.Forbidden:
-            print(f"Missing permissions to delete messages in channel {channel.id}")
-        except discord.HTTPException as e:
-            print(f"Error deleting messages in channel {channel.id}: {e}")
+        # Only messages still in the guild's configured channel are reused
+        for stream_id, (message_channel_id, message_id) in entry.get("streams", {}).items():
+            if message_channel_id != channel_id:
+                continue
+            stream_messages.setdefault(guild_id, {})[stream_id] = channel.get_partial_message(message_id)
+            if str(message_id) in fingerprints:
+                message_fingerprints[message_id] = fingerprints[str(message_id)]
+            restored += 1
+
+        no_stream = entry.get("no_stream")
+        if no_stream and no_stream[0] == channel_id:
+            no_stream_message[guild_id] = channel.get_partial_message(no_stream[1])
+            restored += 1
+
+        digest = [message_id for message_channel_id, message_id in entry.get("digest", []) if message_channel_id == channel_id]
+        if digest:
+            digest_messages[guild_id] = [channel.get_partial_message(message_id) for message_id in digest]
+            for message_id in digest:
+                if str(message_id) in fingerprints:
+                    message_fingerprints[message_id] = fingerprints[str(message_id)]
+            restored += len(digest)
+    return restored
+
+# Ids of every message the bot is currently tracking
+def tracked_message_ids():
+    message_ids = {message.id for streams in stream_messages.values() for message in streams.values()}
+    message_ids.update(message.id for message in no_stream_message.values())
+    message_ids.update(message.id for messages in digest_messages.values() for message in messages)
+    return message_ids
+
+# Delete a message through the outbound queue, ignoring ones that are already gone
+async def delete_message(message):
+    try:
+        await outbound.delete(message)
+    except discord.NotFound:
+        pass
+
+# Function to delete old messages on bot startup (messages restored from the last run are kept)
+async def delete_old_messages(before=None):
+    keep = tracked_message_ids()
+    semaphore = asyncio.Semaphore(GUILD_UPDATE_CONCURRENCY)
+    channels = [bot.get_channel(channel_id) for channel_id in channel_settings.values()]
+
+    # Channels are cleaned concurrently; the one-by-one deletes only need pacing within a channel
+    async def clean(channel):
+        async with semaphore:
+            await delete_old_messages_in(channel, keep, before)
+
+    await asyncio.gather(*(clean(channel) for channel in channels if channel is not None))
+
+# Delete up to 100 old messages in one channel
+async def delete_old_messages_in(channel, keep, before=None):
+    try:
+        # Fetch the last 100 messages from the channel (only ones from before startup when running alongside the loop)
+        messages = [message async for message in channel.history(limit=100, before=before) if message.id not in keep]
+        
+        # Use timezone-aware datetime for comparison
+        current_time = datetime.now(timezone.utc)
+        
+        # Separate messages into those that can be bulk deleted and those that cannot
+        messages_to_bulk_delete = [msg for msg in messages if (current_time - msg.created_at).days < 14]
+        messages_to_delete_one_by_one = [msg for msg in messages if (current_time - msg.created_at).days >= 14]
+
+        # Bulk delete messages that are less than 14 days old
+        if messages_to_bulk_delete:
+            await outbound.bulk_delete(channel, messages_to_bulk_delete)
+            print(f"Bulk deleted {len(messages_to_bulk_delete)} messages in channel {channel.id}")
+
+        # Delete older messages one by one; the outbound queue paces them
+        await asyncio.gather(*(delete_message(message) for message in messages_to_delete_one_by_one))
+
+    except discord.Forbidden:
+        print(f"Missing permissions to delete messages in channel {channel.id}")
+    except discord.HTTPException as e:
+        print(f"Error deleting messages in channel {channel.id}: {e}")
             
 # Function to reload channel settings dynamically
 def reload_channel_settings():
@@ -308,12 +689,393 @@ def reload_channel_settings():
     except FileNotFoundError:
         channel_settings = {}
 
-# Task to check Twitch API every minute
-@tasks.loop(minutes=1)
+# Footer for stream messages, flagging data served from the last good snapshot while Helix is failing
+def stream_footer(suffix=""):
+    text = f"Sinon - Made by Puppetino{suffix}"
+    if stale_as_of is not None:
+        text += f" · ⚠️ Twitch unavailable, showing data from {stale_as_of:%H:%M} UTC"
+    return text
+
+# Show the streamer's name and avatar from the user cache (filled before rendering, never fetched here)
+def set_stream_author(embed, stream):
+    user = user_cache.peek(stream.user_id)
+    if user is not None and user.get("profile_image_url"):
+        embed.set_author(name=user.get("display_name") or stream.user_name, icon_url=user["profile_image_url"])
+
+# Build the embed for a single stream
+def build_stream_embed(stream):
+    state = stream_state.get(stream.id)
+
+    # Check if the streamer is a developer
+    dev_info = developer_info(stream)
+    if dev_info is not None:
+        quote = state.quote
+
+        # Create a special embed for developer streams
+        embed = discord.Embed(
+            title=f"{dev_info['display_name']} is live!",
+            url=dev_info["url"],
+            description=(
+                f"**{quote}**\n\n"
+                f"One of the developers of {stream.game_name} is live!\n\n"
+                f"{stream.title}"
+            ),
+            color=discord.Color.gold()
+        )
+        set_stream_author(embed, stream)
+        embed.add_field(name="Viewers", value=stream.viewer_count, inline=True)
+        embed.add_field(name="Max Viewers", value=state.max_viewers, inline=True)
+        embed.add_field(name="Duration", value=stream.duration_str, inline=True)
+        embed.set_thumbnail(url=stream.thumbnail_url)
+        embed.set_footer(text=stream_footer())
+    else:
+        # Regular embed for other streamers
+        embed = discord.Embed(
+            title=stream.title,
+            url=f"https://www.twitch.tv/{stream.user_name}",
+            description=f"{stream.user_name} is streaming {stream.game_name}",
+            color=discord.Color.purple()
+        )
+        set_stream_author(embed, stream)
+        embed.add_field(name="Viewers", value=stream.viewer_count)
+        embed.add_field(name="Max Viewers", value=state.max_viewers)
+        embed.add_field(name="Duration", value=stream.duration_str)
+        embed.set_thumbnail(url=stream.thumbnail_url)
+        embed.set_footer(text=stream_footer())
+    return embed
+
+# Digest pages as [(embeds, fingerprint)], one entry per message, kept under Discord's embed limits
+def build_digest_pages(streams, category_names):
+    if not streams:
+        embed = discord.Embed(
+            title="No live streams found",
+            description=f"There are no streams currently live in {describe_categories(category_names)}.",
+            color=discord.Color.purple()
+        )
+        embed.set_footer(text="Sinon - Made by Puppetino")
+        return [([embed], embed_fingerprint(embed))]
+
+    lines = [
+        f"🔴 **[{stream.user_name}](https://www.twitch.tv/{stream.user_login})** · {stream.viewer_count} viewers · {stream.duration_str}\n"
+        f"{stream.title[:DIGEST_TITLE_LENGTH]}"
+        for stream in sorted(streams, key=lambda stream: stream.viewer_count, reverse=True)
+    ]
+
+    # Greedily fill embeds, then messages, staying under the per-embed and per-message character limits
+    messages, embeds, chunk = [], [], []
+    embed_chars = message_chars = 0
+    for line in lines:
+        size = len(line) + 2
+        if chunk and (embed_chars + size > DIGEST_EMBED_CHARS or message_chars + size > DIGEST_MESSAGE_CHARS):
+            embeds.append(chunk)
+            chunk, embed_chars = [], 0
+            if message_chars + size > DIGEST_MESSAGE_CHARS or len(embeds) == 10:
+                messages.append(embeds)
+                embeds, message_chars = [], 0
+        chunk.append(line)
+        embed_chars += size
+        message_chars += size
+    embeds.append(chunk)
+    messages.append(embeds)
+
+    pages = []
+    for page, chunks in enumerate(messages, start=1):
+        page_embeds = []
+        for chunk in chunks:
+            page_embeds.append(discord.Embed(description="\n\n".join(chunk), color=discord.Color.purple()))
+        if page == 1:
+            page_embeds[0].title = f"{len(lines)} live stream{'s' if len(lines) != 1 else ''} in {describe_categories(category_names)}"
+        page_embeds[-1].set_footer(text=stream_footer(f" · Page {page}/{len(messages)}"))
+        fingerprint = hashlib.blake2b("".join(embed_fingerprint(embed) for embed in page_embeds).encode("utf-8"), digest_size=16).hexdigest()
+        pages.append((page_embeds, fingerprint))
+    return pages
+
+# Bring a guild's digest messages in line with its pages, editing in place and sending/deleting only when the page count changes
+async def update_digest(guild_id, channel, pages):
+    if guild_id in no_stream_message:
+        await delete_message(no_stream_message.pop(guild_id))
+
+    messages = digest_messages.setdefault(guild_id, [])
+    extra = messages[len(pages):]
+    del messages[len(pages):]
+    for message in extra:
+        message_fingerprints.pop(message.id, None)
+
+    pending = {}
+    for index, (embeds, fingerprint) in enumerate(pages):
+        if index >= len(messages):
+            pending[index] = outbound.send(channel, embeds=embeds)
+        elif message_fingerprints.get(messages[index].id) != fingerprint:
+            pending[index] = outbound.edit(messages[index], embeds=embeds)
+
+    # New pages have to stay in order, so a page that lands early waits here until the pages before it exist
+    sent_early = {}
+
+    # Record each page as soon as its own send or edit finishes, so a timeout can't lose ones that landed
+    async def apply(index, future):
+        embeds, fingerprint = pages[index]
+        try:
+            message = await future
+        except discord.NotFound:
+            if index >= len(messages):
+                raise
+            # Deleted behind our back: send the page again
+            message_fingerprints.pop(messages[index].id, None)
+            message = await outbound.send(channel, embeds=embeds)
+            messages[index] = message
+            update_stat("messages_sent", stats["messages_sent"] + 1)
+        message_fingerprints[message.id] = fingerprint
+        if index < len(messages):
+            return
+        update_stat("messages_sent", stats["messages_sent"] + 1)
+        sent_early[index] = message
+        while len(messages) in sent_early:
+            messages.append(sent_early.pop(len(messages)))
+
+    try:
+        results = await asyncio.gather(
+            *(apply(index, future) for index, future in pending.items()),
+            *(delete_message(message) for message in extra),
+            return_exceptions=True,
+        )
+    finally:
+        # Pages that can't be placed because an earlier page never arrived are removed; the next tick resends them
+        for message in sent_early.values():
+            message_fingerprints.pop(message.id, None)
+            run_in_background(delete_message(message))
+    error = next((result for result in results if isinstance(result, Exception)), None)
+    if error is not None:
+        raise error
+
+# Delete a guild's digest messages (when it leaves digest mode or its channel changes)
+async def remove_digest(guild_id):
+    messages = digest_messages.pop(guild_id, [])
+    for message in messages:
+        message_fingerprints.pop(message.id, None)
+    await asyncio.gather(*(delete_message(message) for message in messages))
+
+# on_unclaimed hook for a stream message send: track the message if its slot is still empty, otherwise delete it
+def adopt_stream_message(guild_id, stream_id, fingerprint):
+    def adopt(message):
+        streams = stream_messages.setdefault(guild_id, {})
+        if stream_id in streams:
+            run_in_background(delete_message(message))
+            return
+        streams[stream_id] = message
+        message_fingerprints[message.id] = fingerprint
+        update_stat("messages_sent", stats["messages_sent"] + 1)
+        message_persister.mark_dirty()
+    return adopt
+
+# on_unclaimed hook for a "no streams" message send
+def adopt_no_stream_message(guild_id):
+    def adopt(message):
+        if guild_id in no_stream_message:
+            run_in_background(delete_message(message))
+            return
+        no_stream_message[guild_id] = message
+        message_persister.mark_dirty()
+    return adopt
+
+# Bring one guild's channel in line with the current streams ({stream_id: (embed, fingerprint)}).
+# Digest guilds pass their digest pages; rendered then only holds the developer streams announced on their own.
+async def update_guild(guild_id, channel, rendered, digest=None):
+    # Ensure guild-specific message tracking exists
+    if guild_id not in stream_messages:
+        stream_messages[guild_id] = {}
+
+    if digest is not None:
+        await update_digest(guild_id, channel, digest)
+    elif guild_id in digest_messages:
+        await remove_digest(guild_id)
+
+    # Handle no live streams case (digest guilds show it in the digest instead)
+    if not rendered:
+        if digest is None and guild_id not in no_stream_message:
+            embed = discord.Embed(
+                title="No live streams found", 
+                description=f"There are no streams currently live in {describe_categories(guild_category_names(guild_id))}.",
+                color=discord.Color.purple()
+            )
+            embed.set_footer(text="Sinon - Made by Puppetino")
+            no_stream_message[guild_id] = await outbound.send(channel, on_unclaimed=adopt_no_stream_message(guild_id), embed=embed)
+    else:
+        # If there was a previous "no streams" message, delete it
+        if guild_id in no_stream_message:
+            await delete_message(no_stream_message.pop(guild_id))
+
+        # Queue every send and edit at once (skipping edits that wouldn't change what is shown);
+        # the outbound queue sends new streams first and paces the rest
+        pending = {}
+        for stream_id, (embed, fingerprint) in rendered.items():
+            message = stream_messages[guild_id].get(stream_id)
+            if message is None:
+                pending[stream_id] = outbound.send(channel, on_unclaimed=adopt_stream_message(guild_id, stream_id, fingerprint), embed=embed)
+            elif message_fingerprints.get(message.id) != fingerprint:
+                pending[stream_id] = outbound.edit(message, embed=embed)
+
+        # Record each result as soon as it lands, so a guild timeout can't lose messages that were already posted
+        async def apply(stream_id, future):
+            embed, fingerprint = rendered[stream_id]
+            message = stream_messages[guild_id].get(stream_id)
+            try:
+                result = await future
+            except discord.NotFound:
+                if message is None:
+                    raise
+                # The message was deleted behind our back (or didn't survive a restart): send a new one
+                message_fingerprints.pop(message.id, None)
+                del stream_messages[guild_id][stream_id]
+                result = await outbound.send(channel, on_unclaimed=adopt_stream_message(guild_id, stream_id, fingerprint), embed=embed)
+                message = None
+            if message is None:
+                message = stream_messages[guild_id][stream_id] = result
+                update_stat("messages_sent", stats["messages_sent"] + 1)  # Increment messages sent
+            message_fingerprints[message.id] = fingerprint
+
+        results = await asyncio.gather(*(apply(stream_id, future) for stream_id, future in pending.items()), return_exceptions=True)
+        error = next((result for result in results if isinstance(result, Exception)), None)
+        if error is not None:
+            raise error
+
+    await remove_ended_messages(guild_id, rendered)
+
+# Remove a guild's messages for streams that are no longer live
+async def remove_ended_messages(guild_id, current_streams):
+    streams = stream_messages.get(guild_id, {})
+    ended = [streams.pop(stream_id) for stream_id in list(streams) if stream_id not in current_streams]
+    for message in ended:
+        message_fingerprints.pop(message.id, None)
+    await asyncio.gather(*(delete_message(message) for message in ended))
+
+# Run one guild update under the shared semaphore, recording how it went
+async def run_guild_update(semaphore, guild_id, channel, rendered, result, digest=None):
+    async with semaphore:
+        try:
+            await asyncio.wait_for(update_guild(guild_id, channel, rendered, digest), timeout=GUILD_UPDATE_TIMEOUT)
+            result["succeeded"].append(guild_id)
+        except asyncio.TimeoutError:
+            result["timed_out"].append(guild_id)
+            print(f"Timed out updating guild {guild_id} after {GUILD_UPDATE_TIMEOUT}s")
+        except Exception as e:
+            result["failed"][guild_id] = repr(e)
+            print(f"Error updating guild {guild_id}: {e}")
+
+# Task to check the Twitch API; the interval is retuned by the poll scheduler after every tick.
+# tasks.loop runs iterations back to back, so a tick that overruns delays the next one instead of overlapping it.
+@tasks.loop(seconds=POLL_BASE_INTERVAL)
 async def check_twitch_streams():
-    global no_stream_message, stream_messages, max_viewers, stream_quotes
-    streams_data = await get_twitch_streams()
-    current_streams = {stream["id"]: stream for stream in streams_data}
+    global tick_count, last_tick_duration, next_poll_interval, tick_running, last_tick_started, early_tick_requested
+    tick_started = time.monotonic()
+    tick_running = True
+    last_tick_started = tick_started
+    requests_before = twitch.request_count
+    try:
+        diff, live_count = await run_tick()
+        started_hours = [previous_streams[stream_id].started_at.hour for stream_id in diff.added]
+        poll_scheduler.record_tick(
+            changed=bool(diff.added or diff.removed),
+            live_count=live_count,
+            helix_requests=twitch.request_count - requests_before,
+            started_hours=started_hours,
+        )
+    finally:
+        tick_running = False
+        tick_count += 1
+        last_tick_duration = time.monotonic() - tick_started
+        next_poll_interval = poll_scheduler.next_interval()
+        if early_tick_requested:
+            # An EventSub notification arrived mid-tick: check again straight away
+            early_tick_requested = False
+            next_poll_interval = 1.0
+        # The loop measures from the start of a tick, so add this tick's duration to get a full rest period
+        check_twitch_streams.change_interval(seconds=last_tick_duration + next_poll_interval)
+
+# Wake the poll loop now instead of waiting out its interval
+def request_early_tick():
+    global early_tick_requested
+    if tick_running:
+        early_tick_requested = True
+    elif check_twitch_streams.is_running() and last_tick_started is not None:
+        # The loop schedules from the last tick's start, so this interval puts the next tick at "now"
+        check_twitch_streams.change_interval(seconds=time.monotonic() - last_tick_started)
+
+# Called by the EventSub client for stream.online/stream.offline notifications
+async def on_eventsub_notification(subscription_type, event):
+    print(f"EventSub {subscription_type}: {event.get('broadcaster_user_login')}")
+    # /streams can lag the notification, so besides checking now keep polling fast for a while
+    poll_scheduler.record_external_change()
+    request_early_tick()
+
+# Start the EventSub listener for the known broadcasters (the developers list)
+async def start_eventsub():
+    global eventsub_client
+    if not TWITCH_USER_ACCESS_TOKEN:
+        print("EventSub is enabled but TWITCH_USER_ACCESS_TOKEN is not set; relying on polling only")
+        return
+    if not developer_ids:
+        await resolve_developer_ids()
+    user_ids = list(developer_ids)
+    if not user_ids:
+        print("EventSub: no broadcaster ids resolved yet; they are subscribed once retry_developer_ids() finds them")
+    eventsub_client = EventSubClient(
+        twitch,
+        TWITCH_USER_ACCESS_TOKEN,
+        user_ids,
+        on_eventsub_notification,
+        ws_url=EVENTSUB_WS,
+        subscriptions_url=EVENTSUB_SUBSCRIPTIONS,
+    )
+    eventsub_client.start()
+    print(f"EventSub listening for {len(user_ids)} broadcasters")
+
+# One pass of fetching streams and updating every guild
+# Workers pass the leader's snapshot instead of polling Helix themselves
+async def run_tick(snapshot=None):
+    global previous_streams, bot_presence, last_tick_result, last_good_streams, last_good_fetch, stale_as_of, history_reconciled
+    now = datetime.now(timezone.utc)
+    if snapshot is None:
+        streams_data = await get_twitch_streams()
+        if streams_data is not None:
+            last_good_streams, last_good_fetch, stale_as_of = streams_data, now, None
+            retry_developer_ids()
+        elif last_good_streams is None:
+            # Nothing good to show yet: leave every channel as it is rather than posting "no streams"
+            return StreamDiff([], [], [], []), len(previous_streams)
+        elif now - last_good_fetch <= timedelta(seconds=HELIX_STALE_MAX_AGE):
+            # Twitch is failing: keep showing the last good snapshot, marked stale, instead of deleting everything
+            streams_data, stale_as_of = last_good_streams, last_good_fetch
+        else:
+            print(f"Helix has been failing since {last_good_fetch:%H:%M} UTC, no longer showing the stale snapshot")
+            streams_data, stale_as_of = [], None
+    else:
+        streams_data = snapshot["streams"]
+        game_ids.update(snapshot["game_ids"])
+        game_names.update(snapshot["game_names"])
+        stale_as_of = datetime.fromisoformat(snapshot["stale_as_of"]) if snapshot.get("stale_as_of") else None
+
+    # Parse each stream once; everything after this works on the precomputed records
+    current_streams = {}
+    for data in streams_data:
+        record = StreamRecord.from_helix(data, now)
+        current_streams[record.id] = record
+
+    # Fill the user cache for this tick's streamers with batched requests, so rendering only reads from it
+    if snapshot is None:
+        try:
+            await user_cache.get_users([stream.user_id for stream in current_streams.values() if stream.user_id])
+        except TwitchAPIError as e:
+            print(f"Error fetching user metadata: {e}")
+    else:
+        for user in snapshot.get("users", []):
+            user_cache.put(user)
+        developer_ids.update(snapshot.get("developer_ids", {}))
+    developer_stream_ids = {stream_id for stream_id, stream in current_streams.items() if developer_info(stream) is not None}
+
+    # Work out which streams started, changed or ended since the last tick
+    last_streams = previous_streams
+    diff = diff_streams(last_streams, current_streams)
+    previous_streams = current_streams
 
     # Reload channel settings dynamically
     reload_channel_settings()
@@ -323,126 +1085,187 @@ async def check_twitch_streams():
     update_stat("active_streams", len(current_streams))  # Current number of active streams
     update_stat("guilds_tracked", len(channel_settings))  # Guilds being tracked
 
-    # Track detailed streams stats
-    detailed_streams = stats.get("detailed_streams", {})
-
+    # Rows for the stream history store
+    history_rows = []
+
+    # Per-stream bookkeeping happens once per tick, before fanning out to guilds
+    for stream_id, stream in current_streams.items():
+        state = stream_state.touch(stream_id)
+        state.max_viewers = max(state.max_viewers, stream.viewer_count)
+
+        # Track stream details
+        history_rows.append({
+            "stream_id": stream_id,
+            "streamer_name": stream.name_lower,
+            "title": stream.title,
+            "start_time": stream.start_time,
+            "peak_viewers": state.max_viewers,
+            "duration": stream.duration_str,
+            "thumbnail_url": stream.thumbnail_url,
+        })
+
+        # Assign a random quote to developer streams if they don't already have one
+        if snapshot is not None:
+            # Use the leader's values so every process renders the same embed
+            leader_state = snapshot["state"].get(stream_id, {})
+            state.max_viewers = max(state.max_viewers, leader_state.get("max_viewers", 0))
+            state.quote = leader_state.get("quote", state.quote)
+        elif stream_id in developer_stream_ids and state.quote is None:
+            state.quote = random.choice(dev_quotes)
+
+    # Ended streams no longer need their state; the size/TTL cap catches anything missed
+    for stream_id in diff.removed:
+        stream_state.evict(stream_id)
+    stream_state.prune()
+
+    # Hand the snapshot to the workers before fanning out, so every process updates its guilds at the same time
+    if snapshot_publisher is not None:
+        snapshot_publisher.publish({
+            "fetched_at": now.isoformat(),
+            "streams": streams_data,
+            "game_ids": game_ids,
+            "game_names": game_names,
+            "stale_as_of": stale_as_of.isoformat() if stale_as_of is not None else None,
+            "developer_ids": developer_ids,
+            "users": [user for user in (user_cache.peek(stream.user_id) for stream in current_streams.values()) if user is not None],
+            "state": {
+                stream_id: {"max_viewers": stream_state.get(stream_id).max_viewers, "quote": stream_state.get(stream_id).quote}
+                for stream_id in current_streams
+            },
+        })
+
+    # Every guild shows the same embed for a stream, so render and fingerprint each one once,
+    # indexed by category so each guild's subset is a few dict merges rather than a scan
+    rendered = {}
+    rendered_by_game = {}
+    for stream_id, stream in current_streams.items():
+        embed = build_stream_embed(stream)
+        rendered[stream_id] = (embed, embed_fingerprint(embed))
+        rendered_by_game.setdefault(stream.game_id, {})[stream_id] = rendered[stream_id]
+
+    # Guilds following the same categories share one subset; guilds with filters then drop
+    # the streams the compiled filter index rejected for them
+    guild_subsets = {}
+    excluded = filter_index.route(current_streams)
+    def rendered_for(guild_id):
+        key = guild_game_ids(guild_id)
+        if key not in guild_subsets:
+            subset = {}
+            for game_id in key:
+                subset.update(rendered_by_game.get(game_id, {}))
+            guild_subsets[key] = subset
+        subset = guild_subsets[key]
+        if guild_id in excluded:
+            subset = {stream_id: value for stream_id, value in subset.items() if stream_id not in excluded[guild_id]}
+        return subset
+
+    # Only touch the presence when it actually changes
+    presence = "Stream Sniping on Twitch" if current_streams else "Scouting for streams..."
+    if presence != bot_presence:
+        await bot.change_presence(activity=discord.CustomActivity(name=presence))
+        bot_presence = presence
+
+    # Update every guild concurrently, isolating failures and slow channels per guild
+    result = {"succeeded": [], "failed": {}, "timed_out": [], "skipped": []}
+    semaphore = asyncio.Semaphore(GUILD_UPDATE_CONCURRENCY)
+    updates = []
+    digests = {}
     for guild_id, channel_id in channel_settings.items():
+        # In multi-process mode a guild belongs to whichever process holds its shard
+        if PROCESS_ROLE != "standalone" and bot.get_guild(int(guild_id)) is None:
+            continue
         channel = bot.get_channel(channel_id)
         if channel is None:
+            result["skipped"].append(guild_id)
             continue
-
-        # Ensure guild-specific message tracking exists
-        if guild_id not in stream_messages:
-            stream_messages[guild_id] = {}
-
-        # Handle no live streams case
-        if not current_streams:
-            await bot.change_presence(activity=discord.CustomActivity(name="Scouting for streams..."))
-            if guild_id not in no_stream_message:
-                embed = discord.Embed(
-                    title="No live streams found", 
-                    description=f"There are no streams currently live in the {CATEGORY_NAME} category.",
-                    color=discord.Color.purple()
-                )
-                embed.set_footer(text="Sinon - Made by Puppetino")
-                no_stream_message[guild_id] = await channel.send(embed=embed)
-            continue
+        subset = rendered_for(guild_id)
+        if guild_id in digest_guilds:
+            # Guilds showing the same streams and categories share one rendered digest
+            names = guild_category_names(guild_id)
+            digest_key = (tuple(subset), tuple(names))
+            if digest_key not in digests:
+                digests[digest_key] = build_digest_pages([current_streams[stream_id] for stream_id in subset], names)
+            developer_streams = {stream_id: value for stream_id, value in subset.items() if stream_id in developer_stream_ids}
+            updates.append(run_guild_update(semaphore, guild_id, channel, developer_streams, result, digests[digest_key]))
         else:
-            await bot.change_presence(activity=discord.CustomActivity(name="Stream Sniping on Twitch"))
-
-        # If there was a previous "no streams" message, delete it
-        if guild_id in no_stream_message:
-            await no_stream_message[guild_id].delete()
-            del no_stream_message[guild_id]
-
-        # Update streams and send embeds
-        for stream_id, stream in current_streams.items():
-            user_name = stream["user_name"].lower()
-            started_at = datetime.fromisoformat(stream["started_at"].replace("Z", "+00:00"))
-            duration = datetime.now(timezone.utc) - started_at
-            duration_str = f"{duration.seconds // 3600}h {duration.seconds % 3600 // 60}m"
-
-            viewer_count = stream["viewer_count"]
-            max_viewers[stream_id] = max(max_viewers.get(stream_id, 0), viewer_count)
-
-            # Track stream details
-            if stream_id not in detailed_streams:
-                detailed_streams[stream_id] = {
-                    "streamer_name": user_name,
-                    "title": stream["title"],  # Include title from Twitch API
-                    "start_time": started_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "end_time": None,
-                    "peak_viewers": viewer_count,
-                    "duration": duration_str,
-                    "thumbnail_url": stream["thumbnail_url"].replace("{width}", "320").replace("{height}", "180")  # Process thumbnail URL
-                }
-            else:
-                detailed_streams[stream_id]["peak_viewers"] = max(
-                    detailed_streams[stream_id]["peak_viewers"], viewer_count
-                )
-                detailed_streams[stream_id]["duration"] = duration_str
-
-            # Check if the streamer is a developer
-            if user_name in developers:
-                dev_info = developers[user_name]
-
-                # Assign a random quote to the stream if it doesn't already have one
-                if stream_id not in stream_quotes:
-                    stream_quotes[stream_id] = random.choice(dev_quotes)
-                quote = stream_quotes[stream_id]
+            updates.append(run_guild_update(semaphore, guild_id, channel, subset, result))
+
+    # Guilds that were unconfigured still get their ended stream messages cleaned up
+    for guild_id in list(stream_messages):
+        if guild_id not in channel_settings:
+            updates.append(remove_ended_messages(guild_id, current_streams))
+    await asyncio.gather(*updates, return_exceptions=True)
+    last_tick_result = result
+
+    # Forget unconfigured guilds once they have nothing left to clean up
+    for guild_id in list(stream_messages):
+        if guild_id not in channel_settings and not stream_messages[guild_id]:
+            del stream_messages[guild_id]
+    message_persister.mark_dirty()
 
-                # Create a special embed for developer streams
-                embed = discord.Embed(
-                    title=f"{dev_info['display_name']} is live!",
-                    url=dev_info["url"],
-                    description=(
-                        f"**{quote}**\n\n"
-                        f"One of the developers of {CATEGORY_NAME} is live!\n\n"
-                        f"{stream['title']}"
-                    ),
-                    color=discord.Color.gold()
-                )
-                embed.add_field(name="Viewers", value=viewer_count, inline=True)
-                embed.add_field(name="Max Viewers", value=max_viewers[stream_id], inline=True)
-                embed.add_field(name="Duration", value=duration_str, inline=True)
-                embed.set_thumbnail(url=detailed_streams[stream_id]["thumbnail_url"])  # Use processed thumbnail URL
-                embed.set_footer(text="Sinon - Made by Puppetino")
-            else:
-                # Regular embed for other streamers
-                embed = discord.Embed(
-                    title=stream["title"],
-                    url=f"https://www.twitch.tv/{stream['user_name']}",
-                    description=f"{stream['user_name']} is streaming {CATEGORY_NAME}",
-                    color=discord.Color.purple()
-                )
-                embed.add_field(name="Viewers", value=viewer_count)
-                embed.add_field(name="Max Viewers", value=max_viewers[stream_id])
-                embed.add_field(name="Duration", value=duration_str)
-                embed.set_thumbnail(url=detailed_streams[stream_id]["thumbnail_url"])  # Use processed thumbnail URL
-                embed.set_footer(text="Sinon - Made by Puppetino")
+    if result["failed"] or result["timed_out"]:
+        print(
+            f"Tick finished: {len(result['succeeded'])} guilds updated, "
+            f"{len(result['failed'])} failed, {len(result['timed_out'])} timed out"
+        )
 
-            # Send or update message
-            if stream_id not in stream_messages[guild_id]:
-                stream_messages[guild_id][stream_id] = await channel.send(embed=embed)
-                update_stat("messages_sent", stats["messages_sent"] + 1)  # Increment messages sent
-            else:
-                await stream_messages[guild_id][stream_id].edit(embed=embed)
-
-    # Remove ended streams from messages and detailed streams
-    for guild_id, streams in list(stream_messages.items()):
-        for stream_id in list(streams):
-            if stream_id not in current_streams:
-                # Delete the message if it exists
-                if stream_id in stream_messages[guild_id]:
-                    await stream_messages[guild_id][stream_id].delete()
-                    del stream_messages[guild_id][stream_id]
-                # Mark stream as ended in detailed streams
-                if stream_id in detailed_streams:
-                    detailed_streams[stream_id]["end_time"] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    # Record live streams, mark ended ones and publish dashboard events, off the event loop (the leader does this for workers)
+    if snapshot is not None:
+        return diff, len(current_streams)
+    end_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        await asyncio.to_thread(stream_history.record_streams, history_rows)
+        if not history_reconciled and last_good_fetch == now:
+            # First fresh snapshot since startup: streams that ended while the bot was down never showed up in a diff
+            closed = await asyncio.to_thread(stream_history.mark_ended_except, current_streams, end_time)
+            history_reconciled = True
+            if closed:
+                print(f"Closed {closed} streams that ended while the bot was offline")
+        await asyncio.to_thread(stream_history.mark_ended, diff.removed, end_time)
+        await asyncio.to_thread(stream_history.append_events, diff_events(diff, last_streams, current_streams, end_time))
+    except Exception as e:
+        print(f"Error updating stream history: {e}")
+
+    return diff, len(current_streams)
+
+# Publish a small liveness record that the dashboard reads instead of probing tmux
+async def write_heartbeat(stopped=False):
+    latency = bot.latency
+    heartbeat = {
+        "timestamp": time.time(),
+        "pid": os.getpid(),
+        "stopped": stopped,
+        "tick_count": tick_count,
+        "last_tick_duration": last_tick_duration,
+        "next_poll_interval": next_poll_interval,
+        "poll_reason": poll_scheduler.last_reason,
+        "startup_timings": startup_timings,
+        "eventsub_connected": eventsub_client.connected if eventsub_client is not None else None,
+        "gateway_latency": latency if math.isfinite(latency) else None,
+        "guilds_failed": len(last_tick_result.get("failed", {})) + len(last_tick_result.get("timed_out", [])),
+        "stream_state_size": len(stream_state),
+        "stream_state_evictions": stream_state.evictions,
+        "tracked_messages": sum(len(streams) for streams in stream_messages.values()),
+        "outbound_queue": outbound.metrics(),
+        "role": PROCESS_ROLE,
+        "helix_circuit": twitch.breaker.state,
+        "helix_ratelimit_remaining": twitch.ratelimit_remaining,
+        "helix_throttled": twitch.throttled,
+        "stale_as_of": stale_as_of.isoformat() if stale_as_of is not None else None,
+        "shards": sorted(bot.shards) if isinstance(bot, discord.AutoShardedClient) else None,
+        "guilds": len(bot.guilds),
+        "ipc_subscribers": snapshot_publisher.subscribers if snapshot_publisher is not None else None,
+        "snapshots_received": snapshot_subscriber.received if snapshot_subscriber is not None else None,
+        "user_cache": {"size": len(user_cache), "hits": user_cache.hits, "misses": user_cache.misses, "fetches": user_cache.fetches},
+    }
+    try:
+        await asyncio.to_thread(atomic_write_json, heartbeat_file, heartbeat, None)
+    except OSError as e:
+        print(f"Error writing heartbeat: {e}")
 
-    # Save detailed streams to stats
-    stats["detailed_streams"] = detailed_streams
-    save_stats()
+@tasks.loop(seconds=HEARTBEAT_INTERVAL)
+async def heartbeat_loop():
+    await write_heartbeat()
 
 # Command to reload channel settings
 @tree.command(name="reload_settings", description="Reload channel settings, clear messages, and prepare for a fresh start.")
@@ -471,13 +1294,18 @@ async def reload_settings(interaction: discord.Interaction):
         # Delete all bot messages in the channel
         async for message in channel.history(limit=100):
             if message.author == bot.user:
-                await message.delete()
+                await delete_message(message)
 
         # Clear tracking for the guild
         if guild_id in stream_messages:
+            for message in stream_messages[guild_id].values():
+                message_fingerprints.pop(message.id, None)
             del stream_messages[guild_id]
         if guild_id in no_stream_message:
             del no_stream_message[guild_id]
+        for message in digest_messages.pop(guild_id, []):
+            message_fingerprints.pop(message.id, None)
+        message_persister.mark_dirty()
 
         # Send confirmation
         embed = discord.Embed(
@@ -509,27 +1337,29 @@ async def set_channel(interaction: discord.Interaction):
         await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
         return
 
-    old_channel_id = channel_settings.get(str(interaction.guild.id))
+    guild_id = str(interaction.guild.id)
+    old_channel_id = channel_settings.get(guild_id)
     
     # If there was a previously set channel, delete the old messages
     if old_channel_id:
         old_channel = bot.get_channel(old_channel_id)
         if old_channel:
             # Delete the old "no stream" message
-            if str(interaction.guild.id) in no_stream_message:
-                await no_stream_message[str(interaction.guild.id)].delete()
-                del no_stream_message[str(interaction.guild.id)]
+            if guild_id in no_stream_message:
+                await delete_message(no_stream_message.pop(guild_id))
             
             # Delete all stream messages
-            for stream_id in list(stream_messages):
-                if stream_messages[stream_id].channel.id == old_channel_id:
-                    await stream_messages[stream_id].delete()
-                    del stream_messages[stream_id]
-                    del max_viewers[stream_id]
+            for stream_id, message in list(stream_messages.get(guild_id, {}).items()):
+                if message.channel.id == old_channel_id:
+                    del stream_messages[guild_id][stream_id]
+                    message_fingerprints.pop(message.id, None)
+                    await delete_message(message)
+            await remove_digest(guild_id)
+            message_persister.mark_dirty()
 
     # Set the new channel ID
-    channel_settings[str(interaction.guild.id)] = interaction.channel.id
-    save_channel_settings()
+    channel_settings[guild_id] = interaction.channel.id
+    save_channel_settings(guild_id)
     
     embed = discord.Embed(
         title="Channel set",
@@ -549,7 +1379,7 @@ async def reset_channel(interaction: discord.Interaction):
     guild_id = str(interaction.guild.id)
     if guild_id in channel_settings:
         del channel_settings[guild_id]
-        save_channel_settings()
+        save_channel_settings(guild_id)
         embed = discord.Embed(
             title="Channel reset",
             description="The channel for Twitch updates has been reset.",
@@ -566,6 +1396,209 @@ async def reset_channel(interaction: discord.Interaction):
         embed.set_footer(text="Sinon - Made by Puppetino")
         await interaction.response.send_message(embed=embed)
 
+# Split a comma-separated command option into a list
+def split_option(value):
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+# Readable summary of a guild's filters
+def describe_filters(filters):
+    if not filters:
+        return "No filters set, every stream is shown."
+    lines = []
+    if "min_viewers" in filters:
+        lines.append(f"**Minimum viewers:** {filters['min_viewers']}")
+    if "languages" in filters:
+        lines.append(f"**Languages:** {', '.join(filters['languages'])}")
+    if "allow" in filters:
+        lines.append(f"**Only streamers:** {', '.join(filters['allow'])}")
+    if "deny" in filters:
+        lines.append(f"**Hidden streamers:** {', '.join(filters['deny'])}")
+    if "keywords" in filters:
+        lines.append(f"**Title keywords:** {', '.join(filters['keywords'])}")
+    return "\n".join(lines)
+
+# Command to set stream filters for this server; list options are comma-separated and "none" clears one
+@tree.command(name="set_filter", description="Filter which streams are shown in this server")
+@app_commands.describe(
+    min_viewers="Only show streams with at least this many viewers (0 to clear)",
+    languages="Comma-separated language codes, e.g. en,de",
+    allow="Comma-separated streamer logins to show exclusively",
+    deny="Comma-separated streamer logins to hide",
+    keywords="Comma-separated words, one of which must appear in the title",
+)
+async def set_filter(interaction: discord.Interaction, min_viewers: int = None, languages: str = None,
+                     allow: str = None, deny: str = None, keywords: str = None):
+    if not has_permission(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    guild_id = str(interaction.guild.id)
+    filters = dict(guild_filters.get(guild_id, {}))
+    if min_viewers is not None:
+        filters["min_viewers"] = min_viewers
+    for key, value in (("languages", languages), ("allow", allow), ("deny", deny), ("keywords", keywords)):
+        if value is not None:
+            filters[key] = [] if value.strip().lower() == "none" else split_option(value)
+
+    filters = normalize_filters(filters)
+    if filters:
+        guild_filters[guild_id] = filters
+    else:
+        guild_filters.pop(guild_id, None)
+    save_guild_filters(guild_id)
+
+    embed = discord.Embed(
+        title="Filters updated",
+        description=describe_filters(filters),
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Command to remove all stream filters for this server
+@tree.command(name="clear_filters", description="Show every stream in this server again")
+async def clear_filters(interaction: discord.Interaction):
+    if not has_permission(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    guild_id = str(interaction.guild.id)
+    guild_filters.pop(guild_id, None)
+    save_guild_filters(guild_id)
+
+    embed = discord.Embed(
+        title="Filters cleared",
+        description=describe_filters({}),
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Command to show this server's stream filters
+@tree.command(name="filters", description="Show the stream filters for this server")
+async def show_filters(interaction: discord.Interaction):
+    embed = discord.Embed(
+        title="Stream filters",
+        description=describe_filters(guild_filters.get(str(interaction.guild.id))),
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Command to switch this server between one message per stream and a single digest message
+@tree.command(name="digest_mode", description="Show all live streams in one summary message instead of one message each")
+async def digest_mode(interaction: discord.Interaction, enabled: bool):
+    if not has_permission(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    guild_id = str(interaction.guild.id)
+    if enabled:
+        digest_guilds.add(guild_id)
+    else:
+        digest_guilds.discard(guild_id)
+    save_digest_guilds(guild_id)
+
+    embed = discord.Embed(
+        title="Digest mode enabled" if enabled else "Digest mode disabled",
+        description=(
+            "Live streams will be listed in a single message that is edited in place. Developer streams are still announced on their own."
+            if enabled else
+            "Each live stream will get its own message again."
+        ),
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Suggest tracked categories while typing a category option
+async def category_autocomplete(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    return [app_commands.Choice(name=name, value=name) for name in CATEGORY_NAMES if current in name.lower()][:25]
+
+# Drop a guild's "no streams" message so it is re-sent naming the categories it now follows
+async def refresh_no_stream_message(guild_id):
+    if guild_id in no_stream_message:
+        await delete_message(no_stream_message.pop(guild_id))
+        message_persister.mark_dirty()
+
+# Command to follow one of the tracked categories in this server
+@tree.command(name="follow_category", description="Show streams from a tracked Twitch category in this server")
+@app_commands.autocomplete(category=category_autocomplete)
+async def follow_category(interaction: discord.Interaction, category: str):
+    if not has_permission(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    name = next((name for name in CATEGORY_NAMES if name.lower() == category.lower()), None)
+    if name is None:
+        await interaction.response.send_message(
+            f"'{category}' is not tracked by this bot. Tracked categories: {', '.join(CATEGORY_NAMES)}",
+            ephemeral=True,
+        )
+        return
+
+    guild_id = str(interaction.guild.id)
+    # Picking a category switches the guild from "everything" to an explicit list
+    followed = guild_categories.setdefault(guild_id, [])
+    if name not in followed:
+        followed.append(name)
+        save_guild_categories(guild_id)
+        await refresh_no_stream_message(guild_id)
+
+    embed = discord.Embed(
+        title="Category followed",
+        description=f"This server now shows streams from {describe_categories(followed)}.",
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Command to stop following a category in this server
+@tree.command(name="unfollow_category", description="Stop showing streams from a Twitch category in this server")
+@app_commands.autocomplete(category=category_autocomplete)
+async def unfollow_category(interaction: discord.Interaction, category: str):
+    if not has_permission(interaction):
+        await interaction.response.send_message("You don't have permission to use this command.", ephemeral=True)
+        return
+
+    guild_id = str(interaction.guild.id)
+    followed = list(guild_category_names(guild_id))
+    name = next((name for name in followed if name.lower() == category.lower()), None)
+    if name is None:
+        await interaction.response.send_message(f"This server doesn't follow '{category}'.", ephemeral=True)
+        return
+
+    followed.remove(name)
+    guild_categories[guild_id] = followed
+    save_guild_categories(guild_id)
+    await refresh_no_stream_message(guild_id)
+
+    embed = discord.Embed(
+        title="Category unfollowed",
+        description=f"This server no longer shows streams from {name}.",
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
+# Command to list the tracked categories and which ones this server follows
+@tree.command(name="categories", description="List the tracked Twitch categories")
+async def categories(interaction: discord.Interaction):
+    followed = {name.lower() for name in guild_category_names(str(interaction.guild.id))}
+    lines = [
+        f"{'✅' if name.lower() in followed else '▫️'} {name}"
+        + (" (not found on Twitch)" if name.lower() in unknown_categories else "")
+        for name in CATEGORY_NAMES
+    ]
+    embed = discord.Embed(
+        title="Tracked categories",
+        description="\n".join(lines),
+        color=discord.Color.purple()
+    )
+    embed.set_footer(text="Sinon - Made by Puppetino")
+    await interaction.response.send_message(embed=embed)
+
 # Command to add a role that can use the bot (admin only)
 @tree.command(name="add_role", description="Add a role that can use the bot")
 async def add_role(interaction: discord.Interaction, role: discord.Role):
@@ -581,7 +1614,7 @@ async def add_role(interaction: discord.Interaction, role: discord.Role):
 
     if role.id not in role_permissions[guild_id]:
         role_permissions[guild_id].append(role.id)
-        save_role_permissions()
+        save_role_permissions(guild_id)
         embed = discord.Embed(
             title="Role added",
             description=f"Role @{role.name} has been given permission to use the bot.",
@@ -610,7 +1643,7 @@ async def remove_role(interaction: discord.Interaction, role: discord.Role):
     guild_id = str(interaction.guild.id)
     if guild_id in role_permissions and role.id in role_permissions[guild_id]:
         role_permissions[guild_id].remove(role.id)
-        save_role_permissions()
+        save_role_permissions(guild_id)
         embed = discord.Embed(
             title="Role removed",
             description=f"Role @{role.name} has been removed from the allowed roles.",
@@ -730,13 +1763,110 @@ async def about(interaction: discord.Interaction):
     embed.set_footer(text="Sinon - Made by Puppetino")
     await interaction.response.send_message(embed=embed)
 
+# Stable hash of the slash-command definitions as they would be sent to Discord
+def command_tree_hash():
+    payload = []
+    for command in tree.get_commands():
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            payload.append(command.to_dict())  # discord.py versions before 2.4 take no argument
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    text = json.dumps({"application_id": bot.application_id, "commands": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# Sync the command tree only when the definitions changed since the last successful sync
+async def sync_command_tree(force=FORCE_TREE_SYNC):
+    tree_hash = command_tree_hash()
+    try:
+        with open(command_tree_file, "r") as file:
+            last_hash = json.load(file).get("hash")
+    except (FileNotFoundError, json.JSONDecodeError):
+        last_hash = None
+
+    if tree_hash == last_hash and not force:
+        print("Slash commands unchanged, skipping tree sync")
+        return
+
+    started = time.monotonic()
+    await tree.sync()
+    print(f"Synced slash commands in {time.monotonic() - started:.2f}s")
+    await asyncio.to_thread(atomic_write_json, command_tree_file, {"hash": tree_hash, "synced_at": time.time()})
+
+# Run one startup step under a deadline, recording how long it took; failures never block the others
+async def run_startup_step(name, coro, deadline=STARTUP_STEP_DEADLINE):
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(coro, timeout=deadline)
+    except asyncio.TimeoutError:
+        startup_timings[name] = "timeout"
+        print(f"Startup step '{name}' missed its {deadline:.0f}s deadline")
+        return None
+    except Exception:
+        startup_timings[name] = "error"
+        traceback.print_exc()
+        print(f"Startup step '{name}' failed")
+        return None
+    startup_timings[name] = round(time.monotonic() - started, 3)
+    print(f"Startup step '{name}' finished in {startup_timings[name]:.2f}s")
+    return result
+
+# Resolve the game ids (which also fetches the Twitch token), then start polling straight away
+async def start_stream_polling():
+    await run_startup_step("game_ids", get_game_ids())
+    check_twitch_streams.start()
+    await run_startup_step("developer_ids", resolve_developer_ids())
+    if EVENTSUB_ENABLED:
+        await run_startup_step("eventsub", start_eventsub())
+
+# Worker processes run a tick for every snapshot the leader publishes
+async def on_leader_snapshot(snapshot):
+    global tick_count, last_tick_duration
+    tick_started = time.monotonic()
+    try:
+        await run_tick(snapshot)
+    finally:
+        tick_count += 1
+        last_tick_duration = time.monotonic() - tick_started
+
+def start_snapshot_worker():
+    global snapshot_subscriber
+    if snapshot_subscriber is None:
+        snapshot_subscriber = SnapshotSubscriber(IPC_ADDRESS, on_leader_snapshot)
+        snapshot_subscriber.start()
+
+# Startup pipeline: independent steps run concurrently and the poll loop only waits for the game id
+async def run_startup():
+    global startup_cleanup_task
+    startup_time = datetime.now(timezone.utc)
+    load_stats()
+    stats_persister.start()
+    restored = restore_message_ids()
+    if restored:
+        print(f"Restored {restored} tracked messages from the last run")
+    message_persister.start()
+    heartbeat_loop.start()
+    if snapshot_publisher is not None:
+        await run_startup_step("ipc", snapshot_publisher.start())
+
+    # Old-message cleanup runs in the background and never touches messages sent after startup
+    startup_cleanup_task = asyncio.create_task(run_startup_step(
+        "delete_old_messages", delete_old_messages(before=startup_time), deadline=STARTUP_CLEANUP_DEADLINE
+    ))
+    if PROCESS_ROLE == "worker":
+        # Workers leave Helix, EventSub and command registration to the leader
+        start_snapshot_worker()
+        return
+    await asyncio.gather(
+        run_startup_step("tree_sync", sync_command_tree()),
+        start_stream_polling(),
+    )
+
 # Event that runs when the bot is ready (reconnected)
 @bot.event
 async def on_ready():
-    global is_disconnected, disconnection_time
+    global is_disconnected, disconnection_time, startup_started
 
-    load_stats()
-    
     if is_disconnected:
         # Calculate downtime duration
         reconnect_time = datetime.now()
@@ -771,13 +1901,11 @@ async def on_ready():
         is_disconnected = False
         disconnection_time = None
 
-    # Regular startup tasks
-    if not check_twitch_streams.is_running():
-        await tree.sync()
-        await delete_old_messages()
+    # Regular startup tasks (on_ready fires again after reconnects, so only run them once)
+    if not startup_started:
+        startup_started = True
         print(f"Successfully logged in as {bot.user}")
-        await get_game_id()
-        check_twitch_streams.start()
+        await run_startup()
 
 # Event that runs when the bot is disconnected
 @bot.event
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import aiohttp
+
+# EventSub WebSocket endpoints; both can be pointed at a local mock server (e.g. `twitch event websocket start-server`)
+EVENTSUB_WS_URL = "wss://eventsub.wss.twitch.tv/ws"
+EVENTSUB_SUBSCRIPTIONS_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
+
+# Subscription types the bot listens for, per broadcaster
+STREAM_SUBSCRIPTION_TYPES = ("stream.online", "stream.offline")
+
+
+# Listens for stream.online/stream.offline over the EventSub WebSocket transport
+class EventSubClient:
+    def __init__(self, twitch, user_token, broadcaster_ids, on_event,
+                 ws_url=EVENTSUB_WS_URL, subscriptions_url=EVENTSUB_SUBSCRIPTIONS_URL,
+                 max_backoff=300.0):
+        self.twitch = twitch  # TwitchClient, whose pooled session is reused
+        self.user_token = user_token  # WebSocket subscriptions require a user access token
+        self.broadcaster_ids = list(broadcaster_ids)
+        self.on_event = on_event  # coroutine called with (subscription_type, event)
+        self.ws_url = ws_url
+        self.subscriptions_url = subscriptions_url
+        self.max_backoff = max_backoff
+        self.session_id = None
+        self.connected = False  # True only while the session has at least one live subscription
+        self.subscriptions = set()  # (broadcaster_id, subscription_type) pairs Twitch accepted on this session
+        self.notifications = 0
+        self._seen_message_ids = []
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.session_id = None
+        self.subscriptions.clear()
+        self.connected = False
+
+    # Reconnect forever with exponential back-off; a clean welcome resets it
+    async def _run(self):
+        backoff = 1.0
+        url = self.ws_url
+        while True:
+            try:
+                reconnect_url = await self._session(url)
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"EventSub connection error: {e}")
+                reconnect_url = None
+            self.session_id = None
+            self.connected = False
+
+            if reconnect_url:
+                # Twitch asked us to move; subscriptions carry over to the new session
+                url = reconnect_url
+                continue
+
+            self.subscriptions.clear()
+            url = self.ws_url
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    # Handle one WebSocket session; returns a reconnect URL if Twitch asked us to move
+    async def _session(self, url):
+        keepalive_timeout = 30.0
+        async with self.twitch.session.ws_connect(url, heartbeat=None) as ws:
+            while True:
+                # Twitch promises a message (at least a keepalive) within keepalive_timeout_seconds
+                message = await ws.receive(timeout=keepalive_timeout + 5)
+                if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    return None
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+
+                data = json.loads(message.data)
+                metadata = data.get("metadata", {})
+                payload = data.get("payload", {})
+                message_type = metadata.get("message_type")
+
+                # Twitch may redeliver a message; drop ones we have already handled
+                message_id = metadata.get("message_id")
+                if message_id in self._seen_message_ids:
+                    continue
+                self._seen_message_ids = (self._seen_message_ids + [message_id])[-100:]
+
+                if message_type == "session_welcome":
+                    session = payload["session"]
+                    self.session_id = session["id"]
+                    keepalive_timeout = float(session.get("keepalive_timeout_seconds") or keepalive_timeout)
+                    # Everything after a fresh connect, or only broadcasters added while Twitch moved us
+                    await self._subscribe(self._unsubscribed())
+                    self.connected = bool(self.subscriptions)
+                    if not self.connected:
+                        print("EventSub: no subscription was accepted on this session")
+                elif message_type == "notification":
+                    self.notifications += 1
+                    subscription_type = payload.get("subscription", {}).get("type")
+                    await self.on_event(subscription_type, payload.get("event", {}))
+                elif message_type == "session_reconnect":
+                    return payload["session"]["reconnect_url"]
+                elif message_type == "revocation":
+                    subscription = payload.get("subscription", {})
+                    print(f"EventSub subscription revoked: {subscription.get('type')} ({subscription.get('status')})")
+                    broadcaster_id = subscription.get("condition", {}).get("broadcaster_user_id")
+                    self.subscriptions.discard((broadcaster_id, subscription.get("type")))
+                    self.connected = bool(self.subscriptions)
+
+    # Broadcasters missing at least one of their subscriptions on this session
+    def _unsubscribed(self):
+        return [
+            broadcaster_id for broadcaster_id in self.broadcaster_ids
+            if any((broadcaster_id, subscription_type) not in self.subscriptions for subscription_type in STREAM_SUBSCRIPTION_TYPES)
+        ]
+
+    # Start listening for more broadcasters; subscribed right away if a session is open, otherwise on the next welcome
+    async def add_broadcasters(self, broadcaster_ids):
+        new_ids = [broadcaster_id for broadcaster_id in broadcaster_ids if broadcaster_id not in self.broadcaster_ids]
+        self.broadcaster_ids.extend(new_ids)
+        if new_ids and self.session_id is not None:
+            await self._subscribe(new_ids)
+            self.connected = bool(self.subscriptions)
+
+    # Create one subscription per broadcaster and type on the current session
+    async def _subscribe(self, broadcaster_ids):
+        headers = {
+            "Client-ID": self.twitch.client_id,
+            "Authorization": f"Bearer {self.user_token}",
+            "Content-Type": "application/json",
+        }
+        for broadcaster_id in list(broadcaster_ids):
+            for subscription_type in STREAM_SUBSCRIPTION_TYPES:
+                if (broadcaster_id, subscription_type) in self.subscriptions:
+                    continue
+                body = {
+                    "type": subscription_type,
+                    "version": "1",
+                    "condition": {"broadcaster_user_id": broadcaster_id},
+                    "transport": {"method": "websocket", "session_id": self.session_id},
+                }
+                async with self.twitch.session.post(self.subscriptions_url, json=body, headers=headers) as response:
+                    if response.status != 202:
+                        print(f"Error subscribing to {subscription_type} for {broadcaster_id}: {response.status}")
+                        continue
+                self.subscriptions.add((broadcaster_id, subscription_type))
@@ -0,0 +1,114 @@
+from bisect import bisect_right
+from collections import deque
+
+# Clean up a guild's filter settings (min_viewers plus lower-cased languages/allow/deny/keywords lists), dropping empty ones
+def normalize_filters(filters):
+    normalized = {}
+    min_viewers = int(filters.get("min_viewers") or 0)
+    if min_viewers > 0:
+        normalized["min_viewers"] = min_viewers
+    for key in ("languages", "allow", "deny", "keywords"):
+        values = sorted({value.strip().lower() for value in filters.get(key) or () if value.strip()})
+        if values:
+            normalized[key] = values
+    return normalized
+
+
+# Aho-Corasick matcher: finds every keyword in a title with one pass over the text
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for keyword in keywords:
+            self._add(keyword)
+        self._build()
+
+    def _add(self, keyword):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            node = next_node
+        self._output[node].add(keyword)
+
+    # Breadth-first pass setting failure links and merging outputs along them
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    # Set of keywords occurring in text (text should already be lower-cased)
+    def search(self, text):
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found |= self._output[node]
+        return found
+
+
+# Per-guild filters compiled into lookup tables, rebuilt only when the settings change
+class FilterIndex:
+    def __init__(self, guild_filters):
+        self.guilds = frozenset(guild_id for guild_id, filters in guild_filters.items() if filters)
+
+        thresholds = sorted((filters["min_viewers"], guild_id) for guild_id, filters in guild_filters.items() if filters.get("min_viewers"))
+        self._thresholds = [threshold for threshold, _ in thresholds]
+        self._threshold_guilds = [guild_id for _, guild_id in thresholds]
+
+        self._language_guilds, self._by_language = self._invert(guild_filters, "languages")
+        self._allow_guilds, self._by_allowed = self._invert(guild_filters, "allow")
+        _, self._by_denied = self._invert(guild_filters, "deny")
+        self._keyword_guilds, self._by_keyword = self._invert(guild_filters, "keywords")
+        self._keywords = KeywordAutomaton(self._by_keyword) if self._by_keyword else None
+
+    # value -> guilds listing it, plus the set of guilds using the filter at all
+    @staticmethod
+    def _invert(guild_filters, key):
+        users, index = set(), {}
+        for guild_id, filters in guild_filters.items():
+            for value in filters.get(key, ()):
+                users.add(guild_id)
+                index.setdefault(value, set()).add(guild_id)
+        return frozenset(users), index
+
+    # Guilds (among those with filters) that must not show this stream
+    def rejecting_guilds(self, stream):
+        rejected = set(self._threshold_guilds[bisect_right(self._thresholds, stream.viewer_count):])
+        if self._language_guilds:
+            rejected |= self._language_guilds - self._by_language.get((stream.language or "").lower(), set())
+        if self._allow_guilds:
+            rejected |= self._allow_guilds - self._by_allowed.get(stream.user_login, set())
+        rejected |= self._by_denied.get(stream.user_login, set())
+        if self._keywords is not None:
+            matched = set()
+            for keyword in self._keywords.search(stream.title.lower()):
+                matched |= self._by_keyword[keyword]
+            rejected |= self._keyword_guilds - matched
+        return rejected
+
+    # {guild_id: set of stream ids it filters out} for a tick's streams ({stream_id: StreamRecord})
+    def route(self, streams):
+        excluded = {}
+        if not self.guilds:
+            return excluded
+        for stream_id, stream in streams.items():
+            for guild_id in self.rejecting_guilds(stream):
+                excluded.setdefault(guild_id, set()).add(stream_id)
+        return excluded
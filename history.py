@@ -0,0 +1,287 @@
+import base64
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from storage import atomic_write_json
+
+# Columns exposed for each stream, in the same shape detailed_streams used in stats.json
+STREAM_COLUMNS = ("streamer_name", "title", "start_time", "end_time", "peak_viewers", "duration", "thumbnail_url")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS streams (
+    stream_id TEXT PRIMARY KEY,
+    streamer_name TEXT NOT NULL,
+    title TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    peak_viewers INTEGER NOT NULL DEFAULT 0,
+    duration TEXT,
+    thumbnail_url TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_streams_streamer_name ON streams (streamer_name);
+CREATE INDEX IF NOT EXISTS idx_streams_start_time ON streams (start_time);
+CREATE INDEX IF NOT EXISTS idx_streams_end_time ON streams (end_time);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# How many recent events are kept for clients resuming with Last-Event-ID
+EVENT_RETENTION = 1000
+
+# Columns the dashboard may sort by (end_time is nullable, so it can't drive a keyset cursor)
+SORT_COLUMNS = {
+    "start_time": "COALESCE(start_time, '')",
+    "streamer_name": "streamer_name",
+    "peak_viewers": "peak_viewers",
+}
+MAX_PAGE_SIZE = 100
+
+
+# Embedded SQLite store for every stream the bot has seen
+class StreamHistory:
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Bump the store version; must be called inside a write transaction
+    def _touch(self):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(time.time()),)
+        )
+
+    # Return (version, updated_at) so readers can tell whether anything changed
+    def get_version(self):
+        with self._lock:
+            rows = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        return int(rows.get("version", 0)), float(rows.get("updated_at", 0))
+
+    # Insert new streams or update live ones; rows are dicts keyed by stream_id
+    def record_streams(self, rows):
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO streams (stream_id, streamer_name, title, start_time, end_time, peak_viewers, duration, thumbnail_url)
+                VALUES (:stream_id, :streamer_name, :title, :start_time, NULL, :peak_viewers, :duration, :thumbnail_url)
+                ON CONFLICT (stream_id) DO UPDATE SET
+                    peak_viewers = MAX(streams.peak_viewers, excluded.peak_viewers),
+                    duration = excluded.duration,
+                    end_time = NULL
+                """,
+                rows,
+            )
+            self._touch()
+
+    # Stamp the end time on streams that are no longer live
+    def mark_ended(self, stream_ids, end_time):
+        if not stream_ids:
+            return
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                "UPDATE streams SET end_time = ? WHERE stream_id = ? AND end_time IS NULL",
+                [(end_time, stream_id) for stream_id in stream_ids],
+            )
+            if cursor.rowcount:
+                self._touch()
+
+    # Stamp the end time on every open stream not in live_ids, e.g. ones that ended while the bot was down; returns how many
+    def mark_ended_except(self, live_ids, end_time):
+        live_ids = set(live_ids)
+        with self._lock, self._conn:
+            open_ids = [row[0] for row in self._conn.execute("SELECT stream_id FROM streams WHERE end_time IS NULL")]
+            ended = [(end_time, stream_id) for stream_id in open_ids if stream_id not in live_ids]
+            if ended:
+                self._conn.executemany("UPDATE streams SET end_time = ? WHERE stream_id = ? AND end_time IS NULL", ended)
+                self._touch()
+        return len(ended)
+
+    # Return streams as {stream_id: details}, newest first
+    def get_streams(self, limit=None):
+        query = "SELECT * FROM streams ORDER BY start_time DESC"
+        params = ()
+        if limit is not None:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return {row["stream_id"]: {column: row[column] for column in STREAM_COLUMNS} for row in rows}
+
+    # Return one page of streams matching the filters, plus the cursor for the next page
+    def query_streams(self, live=None, streamer=None, since=None, until=None,
+                      sort="start_time", descending=True, limit=25, cursor=None):
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column: {sort}")
+        sort_expr = SORT_COLUMNS[sort]
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        where, params = [], []
+        if live is True:
+            where.append("end_time IS NULL")
+        elif live is False:
+            where.append("end_time IS NOT NULL")
+        if streamer:
+            where.append("streamer_name = ?")
+            params.append(streamer.lower())
+        if since:
+            where.append("start_time >= ?")
+            params.append(since)
+        if until:
+            where.append("start_time <= ?")
+            params.append(until)
+        if cursor:
+            # Keyset pagination on (sort value, stream_id) stays cheap however deep the page is
+            last_value, last_id = decode_cursor(cursor)
+            op = "<" if descending else ">"
+            where.append(f"({sort_expr}, stream_id) {op} (?, ?)")
+            params.extend([last_value, last_id])
+
+        direction = "DESC" if descending else "ASC"
+        query = f"SELECT *, {sort_expr} AS sort_value FROM streams"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {sort_expr} {direction}, stream_id {direction} LIMIT ?"
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["sort_value"], rows[-1]["stream_id"])
+        streams = [
+            dict({"stream_id": row["stream_id"]}, **{column: row[column] for column in STREAM_COLUMNS})
+            for row in rows
+        ]
+        return streams, next_cursor
+
+    # Append (type, payload) events for the dashboard and drop ones past the retention window
+    def append_events(self, events):
+        if not events:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO events (type, payload, created_at) VALUES (?, ?, ?)",
+                [(event_type, json.dumps(payload), now) for event_type, payload in events],
+            )
+            self._conn.execute(
+                "DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?", (EVENT_RETENTION,)
+            )
+
+    # Return events newer than after_id as dicts, oldest first
+    def get_events(self, after_id=0, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, type, payload, created_at FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit),
+            ).fetchall()
+        return [
+            {"id": row["id"], "type": row["type"], "data": json.loads(row["payload"]), "created_at": row["created_at"]}
+            for row in rows
+        ]
+
+    def latest_event_id(self):
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM streams").fetchone()[0]
+
+    # Import a legacy detailed_streams dict, keeping any rows already in the store
+    def import_detailed_streams(self, detailed_streams):
+        rows = [
+            {
+                "stream_id": stream_id,
+                "streamer_name": details.get("streamer_name", ""),
+                "title": details.get("title"),
+                "start_time": details.get("start_time"),
+                "end_time": details.get("end_time"),
+                "peak_viewers": details.get("peak_viewers") or 0,
+                "duration": details.get("duration"),
+                "thumbnail_url": details.get("thumbnail_url"),
+            }
+            for stream_id, details in detailed_streams.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT OR IGNORE INTO streams (stream_id, streamer_name, title, start_time, end_time, peak_viewers, duration, thumbnail_url)
+                VALUES (:stream_id, :streamer_name, :title, :start_time, :end_time, :peak_viewers, :duration, :thumbnail_url)
+                """,
+                rows,
+            )
+            self._touch()
+        return len(rows)
+
+
+# Opaque page cursors for query_streams
+def encode_cursor(sort_value, stream_id):
+    raw = json.dumps([sort_value, stream_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor):
+    try:
+        sort_value, stream_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    # Both values are bound into the keyset query, so only scalars SQLite can store get through
+    if not isinstance(sort_value, (str, int, float, type(None))) or not isinstance(stream_id, str):
+        raise ValueError("Invalid cursor")
+    if isinstance(sort_value, int) and not -2 ** 63 <= sort_value < 2 ** 63:
+        raise ValueError("Invalid cursor")
+    return sort_value, stream_id
+
+
+# One-shot migration: move detailed_streams out of stats.json into the history store
+def migrate_stats_file(stats_path, history):
+    try:
+        with open(stats_path, "r") as file:
+            data = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+    detailed_streams = data.pop("detailed_streams", None)
+    if detailed_streams is None:
+        return 0
+
+    imported = history.import_detailed_streams(detailed_streams)
+    atomic_write_json(stats_path, data)
+    return imported
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    history = StreamHistory(os.path.join(data_dir, "history.db"))
+    count = migrate_stats_file(os.path.join(data_dir, "stats.json"), history)
+    print(f"Migrated {count} streams into {history.path}")
+    history.close()
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+# Largest snapshot line a worker will read (a full category page set is well under this)
+MAX_SNAPSHOT_BYTES = 16 * 1024 * 1024
+
+# A worker whose unread backlog grows past this is disconnected; it reconnects and gets the latest snapshot
+MAX_PENDING_BYTES = 4 * 1024 * 1024
+
+
+# Parse "host:port" or "unix:/path/to/socket"
+def parse_address(value):
+    if value.startswith("unix:"):
+        return "unix", value[len("unix:"):]
+    host, _, port = value.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+# Leader side: accepts worker connections and pushes each tick's snapshot to all of them as one JSON line
+class SnapshotPublisher:
+    def __init__(self, address):
+        self.address = address
+        self.published = 0
+        self.latest = None
+        self._server = None
+        self._writers = set()
+
+    @property
+    def subscribers(self):
+        return len(self._writers)
+
+    async def start(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            self._server = await asyncio.start_unix_server(self._handle, path=target)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=target[0], port=target[1])
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        # A worker that connects mid-session starts from the latest snapshot rather than waiting for the next tick
+        if self.latest is not None:
+            writer.write(self.latest)
+        try:
+            await reader.read()  # returns once the worker disconnects
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    # Send a snapshot to every connected worker without waiting on any of them
+    def publish(self, snapshot):
+        line = (json.dumps(snapshot, separators=(",", ":")) + "\n").encode("utf-8")
+        self.latest = line
+        self.published += 1
+        for writer in list(self._writers):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                self._writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(line)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            self._writers.clear()
+            await self._server.wait_closed()
+            self._server = None
+
+
+# Worker side: keeps a connection to the leader and hands snapshots to on_snapshot one at a time,
+# skipping ones that were superseded while the previous snapshot was still being handled
+class SnapshotSubscriber:
+    def __init__(self, address, on_snapshot, max_backoff=30.0):
+        self.address = address
+        self.on_snapshot = on_snapshot  # coroutine called with the decoded snapshot
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.received = 0
+        self.skipped = 0
+        self._latest = None
+        self._available = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._receive()), loop.create_task(self._consume())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.connected = False
+
+    async def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            return await asyncio.open_unix_connection(target, limit=MAX_SNAPSHOT_BYTES)
+        return await asyncio.open_connection(target[0], target[1], limit=MAX_SNAPSHOT_BYTES)
+
+    # Reconnect forever with exponential back-off
+    async def _receive(self):
+        backoff = 1.0
+        while True:
+            try:
+                reader, writer = await self._connect()
+                self.connected = True
+                backoff = 1.0
+                try:
+                    while True:
+                        line = await reader.readline()
+                        if not line:
+                            break
+                        if self._latest is not None:
+                            self.skipped += 1
+                        self._latest = json.loads(line)
+                        self.received += 1
+                        self._available.set()
+                finally:
+                    writer.close()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError) as e:
+                print(f"Snapshot connection error: {e}")
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _consume(self):
+        while True:
+            await self._available.wait()
+            self._available.clear()
+            snapshot, self._latest = self._latest, None
+            if snapshot is None:
+                continue
+            try:
+                await self.on_snapshot(snapshot)
+            except Exception as e:
+                print(f"Error handling snapshot: {e}")
@@ -0,0 +1,291 @@
+import asyncio
+import bisect
+import itertools
+import time
+from collections import Counter, deque
+
+# Lower runs first: announcing a new stream matters more than cleaning up or refreshing one
+PRIORITY_SEND = 0
+PRIORITY_DELETE = 1
+PRIORITY_EDIT = 2
+
+# Default (requests, per seconds) per route and channel, matching Discord's documented message limits
+ROUTE_LIMITS = {
+    "send": (5, 5.0),
+    "edit": (5, 5.0),
+    "delete": (5, 1.0),
+    "bulk_delete": (1, 1.0),
+}
+
+
+# Token bucket tracked ahead of time so requests wait here instead of running into a 429
+class RateBucket:
+    def __init__(self, capacity, per):
+        self.capacity = capacity
+        self.per = per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0.0) * self.capacity / self.per)
+        self.updated = max(now, self.updated)
+
+    # Seconds until the next request may go out
+    def delay(self, now):
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.capacity
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    # Stop the bucket for a while after Discord rate limited us anyway
+    def pause(self, seconds, now):
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+# One queued Discord call, possibly standing in for several coalesced requests
+class OutboundAction:
+    __slots__ = ("kind", "key", "bucket_key", "func", "kwargs", "priority", "seq", "enqueued_at", "waiters", "on_unclaimed")
+
+    def __init__(self, kind, key, bucket_key, func, kwargs, priority, seq, on_unclaimed=None):
+        self.kind = kind
+        self.key = key
+        self.bucket_key = bucket_key
+        self.func = func
+        self.kwargs = kwargs
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.waiters = []
+        self.on_unclaimed = on_unclaimed
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    # A send nobody waits for any more is dropped, since its message could never be tracked
+    def abandoned(self):
+        return self.kind == "send" and all(waiter.done() for waiter in self.waiters)
+
+
+# Central queue for the bot's Discord writes
+class DiscordActionQueue:
+    def __init__(self, concurrency=10, global_limit=(50, 1.0), route_limits=None, on_unclaimed=None):
+        self.route_limits = dict(ROUTE_LIMITS, **(route_limits or {}))
+        self._global = RateBucket(*global_limit)
+        self._buckets = {}
+        self._pending = []  # OutboundActions sorted by (priority, seq)
+        self._by_key = {}  # (kind, message id) -> pending action, for coalescing
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._concurrency = concurrency
+        self._semaphore = None
+        self._task = None
+        self._in_flight = set()
+
+        self.enqueued = Counter()
+        self.executed = Counter()
+        self.coalesced = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.unclaimed = 0
+        # Called with a sent message whose callers all gave up while the send was in flight, so it can be tracked or deleted
+        self.on_unclaimed = on_unclaimed
+        self.max_depth = 0
+        self._waits = deque(maxlen=500)
+
+    # Queue channel.send(**kwargs); the returned future resolves to the sent message.
+    # on_unclaimed overrides the queue's hook for this send if nobody is waiting once it lands.
+    def send(self, channel, on_unclaimed=None, **kwargs):
+        return self._enqueue("send", None, channel.id, channel.send, kwargs, PRIORITY_SEND, on_unclaimed)
+
+    # Queue message.edit(**kwargs); a queued edit of the same message is replaced by this one
+    def edit(self, message, **kwargs):
+        return self._enqueue("edit", message.id, message.channel.id, message.edit, kwargs, PRIORITY_EDIT)
+
+    # Queue message.delete(); a queued edit of the message is dropped since it would be wasted
+    def delete(self, message):
+        edit = self._by_key.pop(("edit", message.id), None)
+        if edit is not None:
+            self._pending.remove(edit)
+            self.coalesced += 1
+            self._resolve(edit, None)
+        return self._enqueue("delete", message.id, message.channel.id, message.delete, {}, PRIORITY_DELETE)
+
+    # Queue channel.delete_messages(messages)
+    def bulk_delete(self, channel, messages):
+        return self._enqueue("bulk_delete", None, channel.id, channel.delete_messages, {"messages": messages}, PRIORITY_DELETE)
+
+    def _enqueue(self, kind, message_id, channel_id, func, kwargs, priority, on_unclaimed=None):
+        self._start()
+        future = asyncio.get_running_loop().create_future()
+        key = (kind, message_id) if message_id is not None else None
+        action = self._by_key.get(key) if key is not None else None
+        if action is not None:
+            # Not sent yet: the newest content wins and every caller gets the one result
+            action.kwargs = kwargs
+            action.waiters.append(future)
+            self.coalesced += 1
+            return future
+
+        action = OutboundAction(kind, key, (kind, channel_id), func, kwargs, priority, next(self._seq), on_unclaimed)
+        action.waiters.append(future)
+        bisect.insort(self._pending, action)
+        if key is not None:
+            self._by_key[key] = action
+        self.enqueued[kind] += 1
+        self.max_depth = max(self.max_depth, len(self._pending))
+        self._wakeup.set()
+        return future
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _bucket(self, bucket_key):
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = RateBucket(*self.route_limits[bucket_key[0]])
+        return bucket
+
+    # Highest-priority action whose buckets allow it to go now, or (None, seconds until one might)
+    def _next_ready(self, now):
+        global_delay = self._global.delay(now)
+        if global_delay > 0:
+            return None, global_delay
+        soonest = None
+        for action in list(self._pending):
+            if action.abandoned():
+                self._pending.remove(action)
+                self.dropped += 1
+                continue
+            delay = self._bucket(action.bucket_key).delay(now)
+            if delay == 0:
+                self._pending.remove(action)
+                if action.key is not None:
+                    self._by_key.pop(action.key, None)
+                self._global.take(now)
+                self._bucket(action.bucket_key).take(now)
+                return action, 0.0
+            soonest = delay if soonest is None else min(soonest, delay)
+        return None, soonest
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._semaphore.acquire()
+            action, delay = self._next_ready(time.monotonic())
+            if action is None:
+                self._semaphore.release()
+                self._wakeup.clear()
+                if delay is None:
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.get_running_loop().create_task(self._execute(action))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, action):
+        try:
+            self._waits.append(time.monotonic() - action.enqueued_at)
+            try:
+                result = await action.func(**action.kwargs)
+            except Exception as e:
+                if getattr(e, "status", None) == 429:
+                    # Our bucket guess was off; pause the route and try again later
+                    self.rate_limited += 1
+                    bucket = self._bucket(action.bucket_key)
+                    bucket.pause(getattr(e, "retry_after", None) or bucket.per, time.monotonic())
+                    self._requeue(action)
+                    return
+                self.failed += 1
+                self._resolve(action, exception=e)
+                return
+            self.executed[action.kind] += 1
+            if not self._resolve(action, result) and action.kind == "send":
+                # The message is posted but nobody will track it; hand it over rather than leave an orphan
+                self.unclaimed += 1
+                hook = action.on_unclaimed or self.on_unclaimed
+                if hook is not None:
+                    hook(result)
+        finally:
+            self._semaphore.release()
+
+    def _requeue(self, action):
+        newer = self._by_key.get(action.key) if action.key is not None else None
+        if newer is not None:
+            # A newer edit arrived meanwhile and supersedes this one
+            newer.waiters.extend(action.waiters)
+            self.coalesced += 1
+            return
+        bisect.insort(self._pending, action)
+        if action.key is not None:
+            self._by_key[action.key] = action
+        self._wakeup.set()
+
+    # Hand the outcome to every caller still waiting; returns whether anyone was
+    @staticmethod
+    def _resolve(action, result=None, exception=None):
+        claimed = False
+        for waiter in action.waiters:
+            if waiter.done():
+                continue
+            if exception is not None:
+                waiter.set_exception(exception)
+            else:
+                waiter.set_result(result)
+            claimed = True
+        return claimed
+
+    # Queue figures for the heartbeat
+    def metrics(self):
+        waits = sorted(self._waits)
+        return {
+            "depth": len(self._pending),
+            "max_depth": self.max_depth,
+            "in_flight": len(self._in_flight),
+            "enqueued": dict(self.enqueued),
+            "executed": dict(self.executed),
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "unclaimed": self.unclaimed,
+            "wait_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_p95": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+            "wait_max": round(waits[-1], 3) if waits else 0.0,
+        }
+
+    # Stop dispatching; in-flight calls finish, queued ones are cancelled
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for action in self._pending:
+            for waiter in action.waiters:
+                waiter.cancel()
+        self._pending.clear()
+        self._by_key.clear()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
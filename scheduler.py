@@ -0,0 +1,99 @@
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+
+# Parse "18-23,0" style hour lists (UTC) into a set of hours
+def parse_hours(value):
+    hours = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = (int(x) % 24 for x in part.split("-", 1))
+            hour = start
+            while True:
+                hours.add(hour)
+                if hour == end:
+                    break
+                hour = (hour + 1) % 24
+        else:
+            hours.add(int(part) % 24)
+    return hours
+
+
+# Picks the delay before the next stream check from recent activity
+class PollScheduler:
+    def __init__(self, base_interval=60.0, min_interval=20.0, hot_interval=30.0, max_interval=300.0,
+                 burst_window=300.0, idle_after=1800.0, helix_budget_per_minute=60, jitter=0.15,
+                 hot_hours=None, learn_min_samples=20, rng=None):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.hot_interval = hot_interval
+        self.max_interval = max_interval
+        self.burst_window = burst_window
+        self.idle_after = idle_after
+        self.helix_budget_per_minute = helix_budget_per_minute
+        self.jitter = jitter
+        self.hot_hours = set(hot_hours or ())
+        self.learn_min_samples = learn_min_samples
+        self.rng = rng or random.Random()
+
+        self.start_hours = Counter()  # UTC hour -> streams seen going live in it
+        self.last_change = None
+        self.empty_since = None
+        self.requests_per_tick = 1.0
+        self.last_reason = "base"
+
+    # Feed the outcome of a tick into the scheduler
+    def record_tick(self, changed, live_count, helix_requests, started_hours=(), now=None):
+        now = time.monotonic() if now is None else now
+        if changed:
+            self.last_change = now
+        if live_count:
+            self.empty_since = None
+        elif self.empty_since is None:
+            self.empty_since = now
+        self.start_hours.update(started_hours)
+        # Smooth the per-tick request cost so one long pagination run doesn't swing the budget
+        self.requests_per_tick = 0.7 * self.requests_per_tick + 0.3 * max(helix_requests, 1)
+
+    # A push notification (EventSub) reported a change: poll fast for a burst window, since Helix lags behind it
+    def record_external_change(self, now=None):
+        self.last_change = time.monotonic() if now is None else now
+
+    # Hours that are configured as hot or where an above-average share of streams went live
+    def is_hot_hour(self, hour):
+        if hour in self.hot_hours:
+            return True
+        total = sum(self.start_hours.values())
+        if total < self.learn_min_samples:
+            return False
+        return self.start_hours[hour] * 24 >= total * 1.5
+
+    # Seconds to rest after the tick that just finished
+    def next_interval(self, now=None, utc_now=None):
+        now = time.monotonic() if now is None else now
+        utc_now = utc_now or datetime.now(timezone.utc)
+
+        if self.last_change is not None and now - self.last_change < self.burst_window:
+            interval, self.last_reason = self.min_interval, "recent change"
+        elif self.is_hot_hour(utc_now.hour):
+            interval, self.last_reason = self.hot_interval, "hot hour"
+        elif self.empty_since is not None and now - self.empty_since >= self.idle_after:
+            # Double the interval for every idle_after spent empty, with jitter so instances drift apart
+            # (the exponent is clamped so months of silence can't overflow the float conversion)
+            periods = min(int((now - self.empty_since) // self.idle_after), 16)
+            interval = min(self.base_interval * (2 ** periods), self.max_interval)
+            interval *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+            self.last_reason = "idle"
+        else:
+            interval, self.last_reason = self.base_interval, "base"
+
+        # Never poll faster than the Helix budget allows
+        budget_floor = 60.0 * self.requests_per_tick / self.helix_budget_per_minute
+        if interval < budget_floor:
+            interval, self.last_reason = budget_floor, "helix budget"
+        return min(max(interval, self.min_interval, budget_floor), max(self.max_interval, budget_floor))
@@ -10,23 +10,62 @@ function controlBot(action) {
     }).catch(error => console.error('Error controlling bot:', error));
 }
 
-// Fetch detailed streams and render them
+// Pagination state for the detected streams list
+const STREAMS_PAGE_SIZE = 24;
+let streamCursors = [null]; // Cursor used to fetch each page visited so far
+let streamPageIndex = 0;
+let streamNextCursor = null;
+let renderedStreamsEtag = null;
+
+// Build the query string for the current page and filters
+function buildStreamsQuery() {
+    const form = document.getElementById('stream-filters');
+    const params = new URLSearchParams({ limit: STREAMS_PAGE_SIZE, sort: form.sort.value });
+    if (form.sort.value === 'streamer_name') {
+        params.set('order', 'asc');
+    }
+    if (form.live.checked) {
+        params.set('live', 'true');
+    }
+    if (form.streamer.value.trim()) {
+        params.set('streamer', form.streamer.value.trim());
+    }
+    if (form.since.value) {
+        params.set('since', form.since.value);
+    }
+    if (form.until.value) {
+        params.set('until', `${form.until.value} 23:59:59`);
+    }
+    const cursor = streamCursors[streamPageIndex];
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    return params.toString();
+}
+
+// Fetch the displayed page of detailed streams and render it
 function fetchDetailedStreams() {
-    fetch('/api/detailed_streams')
-        .then(response => response.json())
-        .then(data => {
+    // The server answers unchanged polls with 304; the browser then hands back its cached copy
+    fetch(`/api/detailed_streams?${buildStreamsQuery()}`, { cache: 'no-cache' })
+        .then(response => {
+            const etag = response.headers.get('ETag');
+            return response.json().then(data => ({ etag, data }));
+        })
+        .then(({ etag, data }) => {
+            streamNextCursor = data.next_cursor;
+            updateStreamPager();
+
+            // Skip re-rendering when the page hasn't changed
+            if (etag && etag === renderedStreamsEtag) {
+                return;
+            }
+            renderedStreamsEtag = etag;
+
             const container = document.getElementById('streams-container');
             container.innerHTML = '';
 
-            // Convert the object to an array and sort by start_time
-            const streams = Object.values(data).sort((a, b) => {
-                const startA = new Date(a.start_time);
-                const startB = new Date(b.start_time);
-                return startB - startA; // Sort by ascending start_time
-            });
-
-            // Render sorted streams
-            streams.forEach(stream => {
+            // Streams arrive already filtered and sorted by the server
+            data.streams.forEach(stream => {
                 const card = document.createElement('div');
                 card.className = 'stream-card';
 
@@ -68,6 +107,21 @@ function fetchDetailedStreams() {
         .catch(error => console.error('Error fetching streams:', error));
 }
 
+// Enable or disable the pager buttons for the current page
+function updateStreamPager() {
+    document.getElementById('streams-prev').disabled = streamPageIndex === 0;
+    document.getElementById('streams-next').disabled = !streamNextCursor;
+    document.getElementById('streams-page').textContent = `Page ${streamPageIndex + 1}`;
+}
+
+// Jump back to the first page (used when filters change)
+function resetStreamPages() {
+    streamCursors = [null];
+    streamPageIndex = 0;
+    streamNextCursor = null;
+    renderedStreamsEtag = null;
+}
+
 // Authenticate the user
 function authenticate() {
     const password = document.querySelector("input[name='password']").value;
@@ -96,23 +150,92 @@ function authenticate() {
         });
 }
 
+// Show the bot status in the UI
+function applyBotStatus(botStatus) {
+    const statusText = document.getElementById('status-text');
+
+    // Update status text and CSS classes
+    statusText.textContent = botStatus.charAt(0).toUpperCase() + botStatus.slice(1);
+    document.body.classList.remove('bot-online', 'bot-offline', 'bot-starting', 'bot-restarting', 'bot-shutting-down');
+    document.body.classList.add(`bot-${botStatus.replace(/\s/g, '-')}`); // Add class dynamically
+}
+
 // Update bot status and UI dynamically
 function updateBotStatus() {
     fetch('/api/status')
         .then(response => response.json())
-        .then(data => {
-            const statusText = document.getElementById('status-text');
-            const statusIndicator = document.getElementById('status-indicator');
-            const botStatus = data.status;
-
-            // Update status text and CSS classes
-            statusText.textContent = botStatus.charAt(0).toUpperCase() + botStatus.slice(1);
-            document.body.classList.remove('bot-online', 'bot-offline', 'bot-starting', 'bot-restarting', 'bot-shutting-down');
-            document.body.classList.add(`bot-${botStatus.replace(/\s/g, '-')}`); // Add class dynamically
-        })
+        .then(data => applyBotStatus(data.status))
         .catch(error => console.error('Error fetching bot status:', error));
 }
 
+// Live updates: the server pushes stream and status events; polling is only a fallback
+const STREAM_EVENT_TYPES = ['stream_started', 'stream_updated', 'stream_ended'];
+const EVENT_POLL_INTERVAL = 5000;
+const MAX_EVENT_STREAM_FAILURES = 3;
+let lastEventId = null;
+let streamsRefreshTimer = null;
+let eventPollTimer = null;
+
+// Coalesce a burst of stream events (one tick) into a single page refresh
+function scheduleStreamsRefresh() {
+    clearTimeout(streamsRefreshTimer);
+    streamsRefreshTimer = setTimeout(fetchDetailedStreams, 500);
+}
+
+// Open the event stream, falling back to polling if it can't stay connected
+function connectEvents() {
+    if (!window.EventSource) {
+        startEventPolling();
+        return;
+    }
+
+    const source = new EventSource('/api/events');
+    let failures = 0;
+
+    source.onopen = () => {
+        failures = 0;
+    };
+    source.addEventListener('status', (event) => {
+        applyBotStatus(JSON.parse(event.data).status);
+    });
+    STREAM_EVENT_TYPES.forEach(type => {
+        source.addEventListener(type, (event) => {
+            lastEventId = event.lastEventId;
+            scheduleStreamsRefresh();
+        });
+    });
+    source.onerror = () => {
+        failures += 1;
+        if (source.readyState === EventSource.CLOSED || failures >= MAX_EVENT_STREAM_FAILURES) {
+            console.warn('Event stream unavailable, falling back to polling');
+            source.close();
+            startEventPolling();
+        }
+    };
+}
+
+// Poll for events at a fixed interval, resuming after the last event seen
+function startEventPolling() {
+    if (eventPollTimer) {
+        return;
+    }
+    const poll = () => {
+        const query = lastEventId ? `?after=${encodeURIComponent(lastEventId)}` : '';
+        fetch(`/api/events/poll${query}`)
+            .then(response => response.json())
+            .then(data => {
+                applyBotStatus(data.status);
+                if (data.events.length) {
+                    scheduleStreamsRefresh();
+                }
+                lastEventId = data.last_event_id;
+            })
+            .catch(error => console.error('Error polling events:', error));
+    };
+    poll();
+    eventPollTimer = setInterval(poll, EVENT_POLL_INTERVAL);
+}
+
 // Attach all event listeners after DOM is loaded
 document.addEventListener('DOMContentLoaded', () => {
     console.log('DOM fully loaded and parsed'); // Debug log
@@ -138,7 +261,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // Attach toggle functionality to section divs
     document.querySelectorAll('.section').forEach(section => {
         section.addEventListener('click', (event) => {
-            if (event.target.matches('input, button, textarea')) {
+            if (event.target.matches('input, button, textarea, select, label')) {
                 return; // Ignore clicks on interactive elements
             }
             const content = section.querySelector('.content');
@@ -155,11 +278,32 @@ document.addEventListener('DOMContentLoaded', () => {
             : "Toggle Light Mode";
     });
 
+    // Attach listeners to the stream filters and pager
+    document.getElementById('stream-filters').addEventListener('submit', (event) => {
+        event.preventDefault(); // Prevent page reload
+        resetStreamPages();
+        fetchDetailedStreams();
+    });
+    document.getElementById('streams-prev').addEventListener('click', () => {
+        if (streamPageIndex > 0) {
+            streamPageIndex -= 1;
+            renderedStreamsEtag = null;
+            fetchDetailedStreams();
+        }
+    });
+    document.getElementById('streams-next').addEventListener('click', () => {
+        if (streamNextCursor) {
+            streamCursors[streamPageIndex + 1] = streamNextCursor;
+            streamPageIndex += 1;
+            renderedStreamsEtag = null;
+            fetchDetailedStreams();
+        }
+    });
+
     // Initial fetch for bot status and streams
     updateBotStatus();
     fetchDetailedStreams();
 
-    // Set up periodic updates
-    setInterval(updateBotStatus, 5000);
-    setInterval(fetchDetailedStreams, 30000);
+    // Subscribe to live updates instead of polling on a fixed interval
+    connectEvents();
 });
\ No newline at end of file
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, but there is only ever one bot process there
+    fcntl = None
+
+
+# Write JSON to a temp file next to the target and rename it into place,
+# so readers only ever see the old file or the complete new one
+def atomic_write_json(path, data, indent=4):
+    atomic_write_text(path, json.dumps(data, indent=indent))
+
+def atomic_write_text(path, text):
+    directory = os.path.dirname(os.fspath(path)) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Hold an exclusive advisory lock on path's sidecar .lock file
+@contextmanager
+def file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(f"{os.fspath(path)}.lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+# Read-modify-write a JSON file under the lock, so processes sharing it don't overwrite each other's changes.
+# update gets the current document (or default_factory() if there is none) and returns the new one, which is also returned.
+def update_json_file(path, update, default_factory=dict, indent=4):
+    with file_lock(path):
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = default_factory()
+        data = update(data)
+        atomic_write_json(path, data, indent=indent)
+    return data
+
+
+# Write-behind persister for a JSON document owned by the event loop
+class JsonPersister:
+    def __init__(self, path, get_data, interval=10.0, indent=4):
+        self.path = path
+        self.get_data = get_data  # callable returning the document to persist
+        self.interval = interval
+        self.indent = indent
+        self.dirty = False
+        self.flush_count = 0
+        self._last_text = None
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    # Record that the document changed; the next flush will write it
+    def mark_dirty(self):
+        self.dirty = True
+
+    # Write the document if it changed since the last flush
+    async def flush(self):
+        async with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            # Serialize on the loop so the worker thread never sees the dict mid-mutation
+            text = json.dumps(self.get_data(), indent=self.indent)
+            if text == self._last_text:
+                return
+            try:
+                await asyncio.to_thread(atomic_write_text, self.path, text)
+                self._last_text = text
+                self.flush_count += 1
+            except OSError as e:
+                self.dirty = True
+                print(f"Error writing {self.path}: {e}")
+
+    # Start the periodic flush task on the running loop
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    # Stop the periodic task and write any pending changes
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+# StreamRecord fields that end up in a rendered stream message
+RENDERED_FIELDS = ("user_name", "title", "game_name", "viewer_count", "thumbnail_url", "started_at")
+
+# Size the thumbnails are rendered at
+THUMBNAIL_WIDTH = "320"
+THUMBNAIL_HEIGHT = "180"
+
+
+# A Helix stream parsed once per tick, with the fields the tick derives from it precomputed
+class StreamRecord:
+    __slots__ = (
+        "id", "user_id", "user_login", "user_name", "name_lower", "game_id", "game_name", "title",
+        "viewer_count", "language", "started_at", "start_time", "duration_str", "thumbnail_url",
+    )
+
+    def __init__(self, id, user_id, user_login, user_name, game_id, game_name, title, viewer_count,
+                 language, started_at, thumbnail_url, now):
+        self.id = id
+        self.user_id = user_id
+        self.user_login = user_login
+        self.user_name = user_name
+        self.name_lower = user_name.lower()
+        self.game_id = game_id
+        self.game_name = game_name
+        self.title = title
+        self.viewer_count = viewer_count
+        self.language = language
+        self.started_at = started_at
+        self.start_time = started_at.strftime("%Y-%m-%d %H:%M:%S")
+        duration = now - started_at
+        self.duration_str = f"{duration.seconds // 3600}h {duration.seconds % 3600 // 60}m"
+        self.thumbnail_url = thumbnail_url
+
+    # Build a record from a Helix /streams item; now is the tick's timestamp
+    @classmethod
+    def from_helix(cls, data, now):
+        return cls(
+            id=data["id"],
+            user_id=data.get("user_id"),
+            user_login=data.get("user_login") or data["user_name"].lower(),
+            user_name=data["user_name"],
+            game_id=data.get("game_id"),
+            game_name=data.get("game_name"),
+            title=data.get("title", ""),
+            viewer_count=data.get("viewer_count", 0),
+            language=data.get("language"),
+            started_at=datetime.fromisoformat(data["started_at"].replace("Z", "+00:00")),
+            thumbnail_url=data.get("thumbnail_url", "").replace("{width}", THUMBNAIL_WIDTH).replace("{height}", THUMBNAIL_HEIGHT),
+            now=now,
+        )
+
+# Stream ids grouped by what happened to them between two snapshots
+StreamDiff = namedtuple("StreamDiff", ["added", "changed", "removed", "unchanged"])
+
+
+# Compare the previous and current snapshots ({stream_id: StreamRecord})
+def diff_streams(previous, current):
+    added, changed, unchanged = [], [], []
+    for stream_id, stream in current.items():
+        old = previous.get(stream_id)
+        if old is None:
+            added.append(stream_id)
+        elif any(getattr(old, field) != getattr(stream, field) for field in RENDERED_FIELDS):
+            changed.append(stream_id)
+        else:
+            unchanged.append(stream_id)
+    removed = [stream_id for stream_id in previous if stream_id not in current]
+    return StreamDiff(added, changed, removed, unchanged)
+
+
+# Stable hash of an embed's rendered content, used to skip edits that would change nothing
+def embed_fingerprint(embed):
+    payload = json.dumps(embed.to_dict(), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Small JSON-friendly view of a stream for dashboard events
+def stream_summary(stream):
+    return {
+        "stream_id": stream.id,
+        "streamer_name": stream.name_lower,
+        "title": stream.title,
+        "game_name": stream.game_name,
+        "viewer_count": stream.viewer_count,
+        "started_at": stream.started_at.isoformat(),
+    }
+
+
+# Dashboard events for one tick's diff, as (type, payload) pairs
+def diff_events(diff, previous, current, end_time):
+    events = [("stream_started", stream_summary(current[stream_id])) for stream_id in diff.added]
+    events += [("stream_updated", stream_summary(current[stream_id])) for stream_id in diff.changed]
+    events += [
+        ("stream_ended", dict(stream_summary(previous[stream_id]), end_time=end_time))
+        for stream_id in diff.removed
+    ]
+    return events
+
+
+# Per-stream state that has to outlive a single tick
+class StreamState:
+    __slots__ = ("max_viewers", "quote", "last_seen")
+
+    def __init__(self):
+        self.max_viewers = 0
+        self.quote = None
+        self.last_seen = 0.0
+
+
+# Holds StreamState per stream id; entries are evicted when the stream ends, with a size/TTL cap as a safety net
+class StreamStateStore:
+    def __init__(self, max_size=5000, ttl=6 * 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._states = OrderedDict()  # least recently seen first
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, stream_id):
+        return stream_id in self._states
+
+    def get(self, stream_id):
+        return self._states.get(stream_id)
+
+    # Return the state for a live stream, creating it if needed and marking it as just seen
+    def touch(self, stream_id, now=None):
+        state = self._states.get(stream_id)
+        if state is None:
+            state = self._states[stream_id] = StreamState()
+        else:
+            self._states.move_to_end(stream_id)
+        state.last_seen = time.monotonic() if now is None else now
+        return state
+
+    # Drop a stream's state once it has ended
+    def evict(self, stream_id):
+        if self._states.pop(stream_id, None) is not None:
+            self.evictions += 1
+
+    # Drop entries not seen within the TTL, then the least recently seen ones over max_size
+    def prune(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self._states:
+            stream_id, state = next(iter(self._states.items()))
+            if now - state.last_seen < self.ttl and len(self._states) <= self.max_size:
+                break
+            del self._states[stream_id]
+            self.evictions += 1
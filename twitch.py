@@ -0,0 +1,362 @@
+import asyncio
+import time
+from collections import OrderedDict
+import aiohttp
+
+# Twitch endpoints
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+HELIX_URL = "https://api.twitch.tv/helix"
+HELIX_PAGE_SIZE = 100  # Largest page size Helix allows
+
+
+# Raised when a Helix request fails part way through a multi-request fetch
+class TwitchAPIError(Exception):
+    def __init__(self, endpoint, status):
+        super().__init__(f"Helix {endpoint} returned {status}")
+        self.endpoint = endpoint
+        self.status = status
+
+
+# Raised instead of calling Helix while the circuit breaker is open
+class HelixUnavailable(TwitchAPIError):
+    def __init__(self, endpoint, retry_in):
+        super().__init__(endpoint, "circuit open")
+        self.retry_in = retry_in
+
+
+# Stops calling Helix after repeated failures and lets a single probe through once the back-off has passed
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, base_backoff=5.0, max_backoff=300.0, probe_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout  # a probe that never reports back (e.g. cancelled) frees the slot after this
+        self.state = "closed"
+        self.failures = 0  # consecutive failures
+        self.trips = 0  # consecutive times the circuit opened, drives the back-off
+        self.open_count = 0
+        self.opened_until = 0.0
+        self.probe_started = None  # set while a half-open probe is in flight
+
+    # Whether a request may go out now; an expired open circuit lets one probe through and holds
+    # everyone else back until that probe succeeds or fails
+    def allow(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.state == "open":
+            if now < self.opened_until:
+                return False
+            self.state = "half_open"
+        elif self.state != "half_open":
+            return True
+        if self.probe_started is not None and now - self.probe_started < self.probe_timeout:
+            return False
+        self.probe_started = now
+        return True
+
+    # Seconds until the circuit lets requests through again
+    def retry_in(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.state == "open":
+            return max(self.opened_until - now, 0.0)
+        if self.state == "half_open" and self.probe_started is not None:
+            return max(self.probe_started + self.probe_timeout - now, 0.0)
+        return 0.0
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self.probe_started = None
+
+    # Count a failure; retry_at (monotonic) keeps the circuit open at least until a known rate-limit reset
+    def record_failure(self, now=None, retry_at=None):
+        now = time.monotonic() if now is None else now
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            # Clamp the exponent so a very long outage can't overflow the float conversion
+            backoff = min(self.base_backoff * (2 ** min(self.trips, 16)), self.max_backoff)
+            self.opened_until = max(now + backoff, retry_at or 0.0)
+            self.state = "open"
+            self.probe_started = None
+            self.trips += 1
+            self.open_count += 1
+
+
+# Tracks the app access token and its expiry, refreshing it before it lapses
+class TokenManager:
+    def __init__(self, fetch_token, refresh_margin=300.0):
+        self._fetch_token = fetch_token  # coroutine returning (token, expires_in)
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self.refresh_count = 0
+        self._refresh_task = None
+
+    # Whether the cached token is still usable outside the refresh margin
+    def is_fresh(self):
+        return self.token is not None and time.monotonic() < self.expires_at - self.refresh_margin
+
+    # Return a valid token, refreshing proactively if it is about to expire
+    async def get_token(self):
+        if self.is_fresh():
+            return self.token
+        return await self.refresh()
+
+    # Refresh the token; pass the token that was rejected so a refresh that already replaced it is reused
+    async def refresh(self, stale_token=None):
+        if stale_token is not None and self.token != stale_token and self.is_fresh():
+            return self.token
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._do_refresh())
+        # Shield so a cancelled caller doesn't cancel the refresh other callers are waiting on
+        return await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self):
+        token, expires_in = await self._fetch_token()
+        self.refresh_count += 1
+        if token is None:
+            self.token = None
+            self.expires_at = 0.0
+            return None
+        self.token = token
+        self.expires_at = time.monotonic() + (expires_in or 0)
+        return token
+
+
+# Long-lived Twitch client shared by every Helix call the bot makes
+class TwitchClient:
+    def __init__(self, client_id, client_secret, timeout=10.0, connect_timeout=5.0,
+                 limit=20, limit_per_host=10, dns_cache_ttl=300, keepalive_timeout=60.0,
+                 token_refresh_margin=300.0, breaker=None, max_throttle_wait=60.0):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.tokens = TokenManager(self._request_token, refresh_margin=token_refresh_margin)
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.request_count = 0  # Helix requests made, for budgeting the poll rate
+        self.breaker = breaker or CircuitBreaker()
+        self.max_throttle_wait = max_throttle_wait
+        self.ratelimit_remaining = None  # from the last Ratelimit-Remaining header
+        self.ratelimit_reset = None  # epoch seconds, from the last Ratelimit-Reset header
+        self.throttled = 0
+        self._session = None
+        self._closed = False
+
+    # The session is created lazily so it binds to the running event loop; never again once close() ran
+    def _get_session(self):
+        if self._closed:
+            raise RuntimeError("TwitchClient is closed")
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    # Pooled session, for callers (like EventSub) that need more than Helix GETs
+    @property
+    def session(self):
+        return self._get_session()
+
+    # Close the pooled session (called when the bot shuts down)
+    async def close(self):
+        self._closed = True
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @property
+    def access_token(self):
+        return self.tokens.token
+
+    # Fetch an app access token using the client credentials flow
+    async def get_access_token(self):
+        return await self.tokens.get_token()
+
+    # POST to id.twitch.tv, returning (token, expires_in); only TokenManager should call this
+    async def _request_token(self):
+        data = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "grant_type": "client_credentials"
+        }
+        async with self._get_session().post(TOKEN_URL, data=data) as response:
+            if response.status != 200:
+                print(f"Error fetching Twitch access token: {response.status}")
+                return None, None
+            response_json = await response.json()
+            return response_json.get("access_token"), response_json.get("expires_in")
+
+    # Perform a GET against a Helix endpoint, returning (status, json body or None).
+    # Raises HelixUnavailable while the circuit is open and TwitchAPIError on network errors.
+    async def helix_get(self, endpoint, params=None):
+        if not self.breaker.allow():
+            raise HelixUnavailable(endpoint, self.breaker.retry_in())
+        token = await self._checked_token(endpoint)
+        if token is None:
+            return 401, None
+
+        status, data = await self._checked_get(endpoint, params, token)
+        if status == 401:
+            # Token was revoked or expired early: refresh once and retry
+            token = await self._checked_token(endpoint, stale_token=token)
+            if token is None:
+                return 401, None
+            status, data = await self._checked_get(endpoint, params, token)
+        return status, data
+
+    # Get the token (or refresh a rejected one) with failures at id.twitch.tv counted by the breaker too
+    async def _checked_token(self, endpoint, stale_token=None):
+        try:
+            if stale_token is None:
+                token = await self.tokens.get_token()
+            else:
+                token = await self.tokens.refresh(stale_token=stale_token)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            raise TwitchAPIError(endpoint, type(e).__name__) from e
+        if token is None:
+            self.breaker.record_failure()
+        return token
+
+    # _get with the outcome fed to the circuit breaker: 429s, 5xx and network errors count as failures
+    async def _checked_get(self, endpoint, params, token):
+        try:
+            status, data = await self._get(endpoint, params, token)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            raise TwitchAPIError(endpoint, type(e).__name__) from e
+        if status == 429:
+            self.breaker.record_failure(retry_at=self._reset_monotonic())
+        elif status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return status, data
+
+    # Ratelimit-Reset as a monotonic deadline, if known
+    def _reset_monotonic(self):
+        if self.ratelimit_reset is None:
+            return None
+        return time.monotonic() + max(self.ratelimit_reset - time.time(), 0.0)
+
+    # Seconds to hold a request because the last response said the bucket is empty
+    def ratelimit_wait(self):
+        if self.ratelimit_remaining is None or self.ratelimit_remaining > 0 or self.ratelimit_reset is None:
+            return 0.0
+        return min(max(self.ratelimit_reset - time.time(), 0.0), self.max_throttle_wait)
+
+    # Follow pagination.cursor, yielding each page's data as it arrives.
+    # params may be a dict or a list of (key, value) pairs for repeated keys like game_id.
+    async def helix_pages(self, endpoint, params=None, first=HELIX_PAGE_SIZE, max_pages=None):
+        base_params = list(params.items()) if isinstance(params, dict) else list(params or [])
+        base_params.append(("first", first))
+        cursor = None
+        pages = 0
+        while True:
+            page_params = base_params + [("after", cursor)] if cursor else base_params
+            status, data = await self.helix_get(endpoint, params=page_params)
+            if status != 200:
+                raise TwitchAPIError(endpoint, status)
+
+            items = data.get("data", [])
+            pages += 1
+            if items:
+                yield items
+
+            cursor = data.get("pagination", {}).get("cursor")
+            if not cursor or not items or (max_pages is not None and pages >= max_pages):
+                return
+
+    async def _get(self, endpoint, params, token):
+        wait = self.ratelimit_wait()
+        if wait > 0:
+            self.throttled += 1
+            await asyncio.sleep(wait)
+        self.request_count += 1
+        headers = {
+            "Client-ID": self.client_id,
+            "Authorization": f"Bearer {token}"
+        }
+        async with self._get_session().get(f"{HELIX_URL}/{endpoint}", params=params, headers=headers) as response:
+            # Helix reports the app's token bucket on every response
+            remaining = response.headers.get("Ratelimit-Remaining")
+            reset = response.headers.get("Ratelimit-Reset")
+            if remaining is not None and remaining.isdigit():
+                self.ratelimit_remaining = int(remaining)
+            if reset is not None and reset.isdigit():
+                self.ratelimit_reset = int(reset)
+            if response.status == 200:
+                return response.status, await response.json()
+            return response.status, None
+
+
+# LRU + TTL cache of Helix user objects, filled by batched /users requests of up to 100 ids or logins
+class UserCache:
+    def __init__(self, twitch, max_size=5000, ttl=3600.0):
+        self.twitch = twitch
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self._users = OrderedDict()  # user id -> (expires_at, user), least recently used first
+        self._logins = {}  # login -> user id
+
+    def __len__(self):
+        return len(self._users)
+
+    # Cached user for an id if it hasn't expired; never calls Helix
+    def peek(self, user_id, now=None):
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] <= (time.monotonic() if now is None else now):
+            return None
+        self._users.move_to_end(user_id)
+        return entry[1]
+
+    # Add or refresh a user object, evicting the least recently used past max_size
+    def put(self, user, now=None):
+        now = time.monotonic() if now is None else now
+        self._users[user["id"]] = (now + self.ttl, user)
+        self._users.move_to_end(user["id"])
+        self._logins[user["login"]] = user["id"]
+        while len(self._users) > self.max_size:
+            _, (_, evicted) = self._users.popitem(last=False)
+            if self._logins.get(evicted["login"]) == evicted["id"]:
+                del self._logins[evicted["login"]]
+
+    # {user id: user} for the given ids, fetching only the missing or expired ones
+    async def get_users(self, user_ids):
+        return await self._lookup("id", user_ids, lambda user_id: user_id, lambda user: user["id"])
+
+    # {login: user} for the given logins, fetching only the missing or expired ones
+    async def get_users_by_login(self, logins):
+        logins = [login.lower() for login in logins]
+        return await self._lookup("login", logins, self._logins.get, lambda user: user["login"])
+
+    async def _lookup(self, key, values, cached_id, result_key):
+        found, missing = {}, []
+        for value in dict.fromkeys(values):
+            user_id = cached_id(value)
+            user = self.peek(user_id) if user_id is not None else None
+            if user is None:
+                missing.append(value)
+            else:
+                found[value] = user
+        self.hits += len(found)
+        self.misses += len(missing)
+        for i in range(0, len(missing), HELIX_PAGE_SIZE):
+            status, data = await self.twitch.helix_get("users", params=[(key, value) for value in missing[i:i + HELIX_PAGE_SIZE]])
+            self.fetches += 1
+            if status != 200:
+                raise TwitchAPIError("users", status)
+            for user in data.get("data", []):
+                self.put(user)
+                found[result_key(user)] = user
+        return found